@@ -1,10 +1,14 @@
 # scripts/backtest.py
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
 import json
 import math
+import numpy as np
 import pandas as pd
+from numba import njit
 from datetime import datetime
 
 # Make sure repo root is in path so "src.*" imports work when launching script direct.
@@ -13,24 +17,39 @@ if str(repo_root) not in sys.path:
     sys.path.insert(0, str(repo_root))
 
 # Now imports from your codebase
-from src.utils.indicators import compute_indicators
-from src.workers.signal_engine import detect_signal
+from src import config
+from src.utils.frame_io import read_ohlcv, write_frame
+from src.workers.signal_engine_nb import signals_nb
 
 # -------------------------
 # Helpers
 # -------------------------
-def load_historical_csv(path: str):
-    df = pd.read_csv(path, parse_dates=["timestamp"])
-
-    # Jika sudah timezone-aware, tidak perlu di-localize
-    # Jika tidak aware (naive), jadikan UTC
-    if df["timestamp"].dt.tz is None:
-        df["timestamp"] = df["timestamp"].dt.tz_localize("UTC")
-    else:
-        df["timestamp"] = df["timestamp"].dt.tz_convert("UTC")
-
-    df = df.sort_values("timestamp").reset_index(drop=True)
-    return df
+@njit(cache=True)
+def _pair_trades(sig, group):
+    """
+    Pasangkan BUY -> SELL secara berurutan pada array sinyal (1=BUY, -1=SELL).
+    group: kode simbol per baris (data sudah terurut per simbol lalu waktu);
+    posisi terbuka di-reset saat simbol berganti (posisi terakhir diabaikan).
+    Return (entry_idx, exit_idx) untuk setiap trade yang tertutup.
+    """
+    n = len(sig)
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.empty(n, dtype=np.int64)
+    k = 0
+    pos = -1
+    for i in range(n):
+        if i > 0 and group[i] != group[i - 1]:
+            pos = -1
+        if sig[i] == 1:
+            if pos < 0:
+                pos = i
+        elif sig[i] == -1:
+            if pos >= 0:
+                entry_idx[k] = pos
+                exit_idx[k] = i
+                k += 1
+                pos = -1
+    return entry_idx[:k], exit_idx[:k]
 
 def naive_pnl_from_signals(sig_df):
     """
@@ -38,85 +57,112 @@ def naive_pnl_from_signals(sig_df):
     - For each symbol, iterate signals in time order.
     - On BUY: open long at price. On SELL: close long at price and record return.
     - Ignore NONE signals. No fees, no slippage, no sizing logic.
+    Semua simbol diproses dalam satu pass kolumnar (sort sekali, tanpa groupby).
     """
-    rows = []
-    grouped = sig_df[sig_df.signal.isin(["BUY","SELL"])].groupby("symbol")
-    for symbol, g in grouped:
-        g = g.sort_values("timestamp")
-        pos = None  # (entry_price, entry_time)
-        for _, r in g.iterrows():
-            if r["signal"] == "BUY":
-                if pos is None:
-                    pos = (r["price"], r["timestamp"])
-            elif r["signal"] == "SELL":
-                if pos is not None:
-                    entry_price, entry_ts = pos
-                    exit_price, exit_ts = r["price"], r["timestamp"]
-                    ret = (exit_price / entry_price) - 1.0 if entry_price and entry_price>0 else None
-                    rows.append({
-                        "symbol": symbol,
-                        "entry_ts": entry_ts,
-                        "exit_ts": exit_ts,
-                        "entry_price": entry_price,
-                        "exit_price": exit_price,
-                        "return": ret,
-                    })
-                    pos = None
-        # optionally ignore open positions at end
-    return pd.DataFrame(rows)
+    g = sig_df.loc[sig_df["signal"].isin(["BUY", "SELL"]), ["symbol", "timestamp", "signal", "price"]]
+    g = g.sort_values(["symbol", "timestamp"], kind="stable")
+    group, _ = pd.factorize(g["symbol"])
+    sig = np.where(g["signal"].to_numpy() == "BUY", 1, -1).astype(np.int8)
+    entry_idx, exit_idx = _pair_trades(sig, group)
+    if len(entry_idx) == 0:
+        return pd.DataFrame()
+
+    price = g["price"].to_numpy(dtype=float)
+    ts = g["timestamp"].array
+    entry_price = price[entry_idx]
+    exit_price = price[exit_idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(entry_price > 0, exit_price / entry_price - 1.0, np.nan)
+    return pd.DataFrame({
+        "symbol": g["symbol"].to_numpy()[entry_idx],
+        "entry_ts": ts[entry_idx],
+        "exit_ts": ts[exit_idx],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "return": ret,
+    })
+
+def _find_ohlcv(data_dir, sym, tf):
+    """
+    File historical_{SYMBOL}_{TF} dari downloader (.parquet atau .csv, parquet diutamakan).
+    Return Path atau None.
+    """
+    for ext in (".parquet", ".csv"):
+        path = Path(data_dir) / f"historical_{sym}_{tf}{ext}"
+        if path.exists():
+            return path
+    return None
 
 # -------------------------
 # Main backtest logic
 # -------------------------
-def backtest_single(csv_path, symbol, timeframe, ema_fast, ema_slow, rsi_period, window_min):
+def backtest_single(csv_path, symbol, timeframe, rsi_period, window_min):
     print(f"[BACKTEST] symbol={symbol}, file={csv_path}, TF={timeframe}")
-    df = load_historical_csv(csv_path)
+    df = read_ohlcv(csv_path)  # timestamp datetime64[ns, UTC], terurut
     if len(df) < window_min:
         print(f"[WARN] Not enough bars ({len(df)}) < window_min ({window_min}), skipping.")
         return pd.DataFrame(), {}
 
-    results = []
-    # Walk-forward: compute indicators on windows to emulate streaming feed
-    for i in range(window_min, len(df)):
-        slice_df = df.iloc[: i+1].copy()
-        slice_ind = compute_indicators(slice_df, ema_fast=ema_fast, ema_slow=ema_slow, rsi_period=rsi_period)
-        signal = detect_signal(slice_ind, symbol, debounce_minutes=0)  # disable debounce for backtest
-        ts = slice_ind["timestamp"].iloc[-1]
-        price = float(slice_ind["close"].iloc[-1])
-        results.append({"timestamp": ts, "symbol": symbol, "signal": signal, "price": price})
-
-    res_df = pd.DataFrame(results)
+    # Aturan sinyal (detect_signal) hanya memakai RSI, dan RSI bersifat kausal
+    # (bar i hanya bergantung pada bar <= i), jadi sinyal semua bar dihitung sekali
+    # oleh kernel numba (setara compute_indicators + detect_signal per bar pada df[:i+1]).
+    # EMA tidak mempengaruhi sinyal, jadi tidak ada parameter ema_fast/ema_slow.
+    ts = df["timestamp"].to_numpy(dtype="datetime64[ns]")  # UTC, tanpa tz object
+    closes = df["close"].to_numpy(dtype=np.float64)
+    sides = signals_nb(closes, rsi_period, config.SL, config.RR)[0]
+    labels = np.where(sides == 1, "BUY", np.where(sides == -1, "SELL", "NONE"))
+
+    res_df = pd.DataFrame({
+        "timestamp": pd.to_datetime(ts[window_min:], utc=True),
+        "symbol": symbol,
+        "signal": labels[window_min:],
+        "price": closes[window_min:],
+    })
     return res_df, {"n_bars": len(df)}
 
+def _backtest_worker(job):
+    """Entry point per simbol untuk ProcessPoolExecutor (harus top-level agar bisa di-pickle)."""
+    sym, csv_path, tf, rsi_period, window_min = job
+    res_df, meta = backtest_single(csv_path, sym, tf, rsi_period, window_min)
+    return sym, res_df, meta
+
 def main():
     parser = argparse.ArgumentParser(description="Backtest signal engine on historical CSV")
     parser.add_argument("--symbols", nargs="+", default=["BTCUSDT"], help="Symbol names (no slash e.g. BTCUSDT) corresponding to csv files")
     parser.add_argument("--tf", default="15m", help="Timeframe (meta only)")
-    parser.add_argument("--data-dir", default="data", help="Directory where historical_{SYMBOL}_{TF}.csv are stored")
-    parser.add_argument("--ema-fast", type=int, default=9)
-    parser.add_argument("--ema-slow", type=int, default=21)
+    parser.add_argument("--data-dir", default="data", help="Directory where historical_{SYMBOL}_{TF}.{parquet|csv} are stored")
     parser.add_argument("--rsi-period", type=int, default=14)
     parser.add_argument("--window-min", type=int, default=200)
-    parser.add_argument("--out-csv", default="data/backtest_signals.csv")
+    parser.add_argument("--out-csv", default="data/backtest_signals.csv", help="Combined signals output (.csv or .parquet; per-symbol/trades files follow the same format)")
     parser.add_argument("--out-summary", default="data/backtest_summary.json")
     parser.add_argument("--out-per-symbol", action="store_true", help="Also write per-symbol CSV to data/")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel processes for multi-symbol runs (1 = sequential)")
     args = parser.parse_args()
 
+    out_ext = Path(args.out_csv).suffix or ".csv"
     all_signals = []
     summary = {"symbols": {}, "params": {
-        "ema_fast": args.ema_fast, "ema_slow": args.ema_slow, "rsi_period": args.rsi_period, "tf": args.tf
+        "rsi_period": args.rsi_period, "tf": args.tf
     }}
 
+    jobs = []
     for sym in args.symbols:
-        # expected csv filename format from fetcher: historical_{SYMBOL}_{TF}.csv (SYMBOL e.g. BTCUSDT)
-        csv_name = f"historical_{sym}_{args.tf}.csv"
-        csv_path = Path(args.data_dir) / csv_name
-        if not csv_path.exists():
-            print(f"[ERROR] missing CSV for {sym}: {csv_path} — skip.")
+        # format nama file dari downloader: historical_{SYMBOL}_{TF}.{parquet|csv} (SYMBOL e.g. BTCUSDT)
+        data_path = _find_ohlcv(args.data_dir, sym, args.tf)
+        if data_path is None:
+            print(f"[ERROR] missing data for {sym}: {Path(args.data_dir) / f'historical_{sym}_{args.tf}'}.(parquet|csv) — skip.")
             continue
+        jobs.append((sym, str(data_path), args.tf, args.rsi_period, args.window_min))
+
+    # tiap simbol independen & CPU-bound -> jalankan paralel antar proses
+    workers = max(1, min(args.workers, len(jobs)))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_backtest_worker, jobs))
+    else:
+        results = [_backtest_worker(job) for job in jobs]
 
-        res_df, meta = backtest_single(str(csv_path), sym.replace("", "/"), args.tf, args.ema_fast, args.ema_slow, args.rsi_period, args.window_min)
-        # note: detect_signal expects symbol like "BTC/USDT" in some code; we pass sym.replace("", "/") above as placeholder; if your detect_signal expects "BTC/USDT" adjust accordingly.
+    for sym, res_df, meta in results:
         # We'll normalize symbol label in output to sym (no slash)
         if res_df.empty:
             print(f"[INFO] no result for {sym}")
@@ -129,8 +175,8 @@ def main():
         summary["symbols"][sym] = {"bars": meta.get("n_bars", None), "signal_counts": counts}
 
         if args.out_per_symbol:
-            out_path = Path(args.data_dir) / f"backtest_signals_{sym}_{args.tf}.csv"
-            res_df.to_csv(out_path, index=False)
+            out_path = Path(args.data_dir) / f"backtest_signals_{sym}_{args.tf}{out_ext}"
+            write_frame(res_df, out_path)
             print(f"[SAVED] per-symbol signals -> {out_path}")
 
     if not all_signals:
@@ -143,7 +189,7 @@ def main():
     # write combined CSV
     out_csv = Path(args.out_csv)
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    all_df.to_csv(out_csv, index=False)
+    write_frame(all_df, out_csv)
     print(f"[SAVED] Combined backtest signals -> {out_csv}")
 
     # compute naive pnl
@@ -162,8 +208,8 @@ def main():
 
     # Also store simple trades file if exist
     if not pnl_df.empty:
-        trades_path = out_csv.parent / f"backtest_trades_summary.csv"
-        pnl_df.to_csv(trades_path, index=False)
+        trades_path = out_csv.parent / f"backtest_trades_summary{out_ext}"
+        write_frame(pnl_df, trades_path)
         print(f"[SAVED] Trades -> {trades_path}")
 
 if __name__ == "__main__":
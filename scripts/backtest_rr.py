@@ -2,157 +2,281 @@
 """
 Backtester simple untuk SL/TP fixed RR.
 - Membaca historical CSV (ohlcv) di folder data/
-- Memakai fungsi detect_signal() dari src.workers.signal_engine
+- Memakai rsi_nb() + aturan detect_signal (RSI_LOW/RSI_HIGH) untuk semua bar sekaligus
 - Simulasi trade intrabar: jika SL/TP terkena di bar, exit dengan tipe SL/TP.
 - Jika reverse signal muncul, close by reverse at close price.
-- Output: data/backtest_trades_summary.csv + data/backtest_signals_rr.csv + data/backtest_summary_rr.json
+- Output: backtest_trades_summary_rr.{csv|parquet} + backtest_signals_rr.{csv|parquet} + backtest_summary_rr.json di --out-dir
+- Sweep parameter (--sweep-rsi-period/--sweep-sl-pct/--sweep-rr): batch_backtest() mengevaluasi
+  semua kombinasi dalam satu pass numba paralel -> backtest_sweep_rr.{csv|parquet}
+  (tanpa sumbu EMA: aturan sinyal hanya memakai RSI)
 """
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import argparse
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import json
-from src.workers.signal_engine import detect_signal  # engine full
+import itertools
+import math
+from numba import njit, prange
+from src.workers.signal_engine import RSI_LOW, RSI_HIGH
+from src.workers.signal_engine_nb import rsi_nb  # kernel RSI (numba, semua bar sekaligus)
 from src import config
+from src.utils.frame_io import iso_utc, read_ohlcv, write_frame
 
-def load_ohlcv_csv(path: Path):
-    df = pd.read_csv(path, parse_dates=["timestamp"])
-    df = df.sort_values("timestamp").reset_index(drop=True)
-    # ensure tz-aware UTC
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df = df.set_index("timestamp")
-    return df
+# urutan = kode exit_reason di buffer trade
+EXIT_REASONS = ("SL", "TP", "Reverse", "EOD")
 
-def run_backtest(data_csv: Path, out_dir: Path, sl_pct: float = None, rr: float = None, debounce_minutes: int = 0):
-    out_dir.mkdir(parents=True, exist_ok=True)
-    df = load_ohlcv_csv(data_csv)
-
-    # defaults from config
-    if sl_pct is None:
-        sl_pct = getattr(config, "SL", 0.01)
-    if rr is None:
-        rr = getattr(config, "RR", 2.0)
+SWEEP_COLUMNS = ("n_trades", "win_rate", "avg_win", "avg_loss", "profit_factor", "total_return")
 
-    trades = []
-    signals = []
+@njit(cache=True, inline="always")
+def _round_half_even(x, ndigits):
+    """
+    round(x, ndigits) persis seperti Python (dibulatkan dari nilai biner eksak, half-even).
+    round() bawaan numba mengalikan x * 10**ndigits dulu, jadi kadang beda 1 digit terakhir.
+    """
+    scale = 10.0 ** ndigits
+    ax = abs(x)
+    # ax * scale = p + err secara eksak (two-product Dekker)
+    p = ax * scale
+    c = 134217729.0 * ax
+    ah = c - (c - ax)
+    al = ax - ah
+    c = 134217729.0 * scale
+    sh = c - (c - scale)
+    sl = scale - sh
+    err = ((ah * sh - p) + ah * sl + al * sh) + al * sl
+    f = math.floor(p)
+    frac = p - f
+    if frac > 0.5 or (frac == 0.5 and (err > 0.0 or (err == 0.0 and f % 2.0 == 1.0))):
+        f += 1.0
+    r = f / scale
+    return -r if x < 0.0 else r
 
+@njit(cache=True)
+def _trades_nb(rsi, closes, highs, lows, sl_pct, rr, rsi_low, rsi_high):
+    """
+    Loop trade (satu-satunya implementasi, dipakai run_backtest dan sweep):
+    entry di close bar sinyal (BUY rsi <= rsi_low, SELL rsi >= rsi_high), harga dibulatkan
+    8 desimal seperti Signal.to_dict(). Exit di bar pertama setelah entry yang kena SL/TP/reverse
+    signal; prioritas di bar yang sama SL > TP > Reverse (SL = worst-case, konservatif),
+    tidak exit -> EOD di close terakhir. Sinyal berikutnya dicari mulai bar exit.
+    Return array per trade: (entry_idx, exit_idx, side 1/-1, kode EXIT_REASONS,
+    entry_price, stop_price, take_price, exit_price).
+    """
+    n = len(closes)
+    entry_i = np.empty(n, dtype=np.int64)
+    exit_j = np.empty(n, dtype=np.int64)
+    side_buf = np.empty(n, dtype=np.int8)
+    reason_buf = np.empty(n, dtype=np.int8)
+    entry_px = np.empty(n, dtype=np.float64)
+    stop_px = np.empty(n, dtype=np.float64)
+    take_px = np.empty(n, dtype=np.float64)
+    exit_px = np.empty(n, dtype=np.float64)
+    k = 0
     i = 0
-    while i < len(df):
-        slice_df = df.iloc[:i+1]  # all bars up to current
-        sig = detect_signal(slice_df, symbol="BTCUSDT", debounce_minutes=debounce_minutes, sl_pct=sl_pct, rr=rr)
-        if sig:
-            # we have entry at current bar close
-            entry_price = sig["entry_price"]
-            stop_price = sig["stop_price"]
-            take_price = sig["take_price"]
-            entry_ts = pd.to_datetime(sig["entry_ts"])
-            side = sig["side"]
-
-            # record signal
-            signals.append({**sig, "bar_index": i, "timestamp": df.index[i].isoformat()})
-
-            # now scan forward from next bar to find exit
-            j = i+1
-            exited = False
-            while j < len(df):
-                high = float(df["high"].iloc[j])
-                low = float(df["low"].iloc[j])
-                close = float(df["close"].iloc[j])
-                exit_price = None
-                exit_reason = None
-                exit_ts = None
-
-                # check intrabar SL/TP by using high/low: assume SL worse-case order: if both hit same bar, choose SL (conservative)
-                if side == "BUY":
-                    if low <= stop_price:
-                        exit_price = stop_price
-                        exit_reason = "SL"
-                        exit_ts = df.index[j]
-                    elif high >= take_price:
-                        exit_price = take_price
-                        exit_reason = "TP"
-                        exit_ts = df.index[j]
-                else:  # SELL
-                    if high >= stop_price:
-                        exit_price = stop_price
-                        exit_reason = "SL"
-                        exit_ts = df.index[j]
-                    elif low <= take_price:
-                        exit_price = take_price
-                        exit_reason = "TP"
-                        exit_ts = df.index[j]
-
-                # if no SL/TP hit, check if reverse signal occurred at bar j (use slice to j)
-                if exit_price is None:
-                    slice_j = df.iloc[:j+1]
-                    rev = detect_signal(slice_j, symbol="BTCUSDT", debounce_minutes=0, sl_pct=sl_pct, rr=rr)
-                    # if reverse exists and opposite side -> close at close price
-                    if rev and rev.get("side") != side:
-                        exit_price = close
-                        exit_reason = "Reverse"
-                        exit_ts = df.index[j]
-
-                if exit_price is not None:
-                    # record trade
-                    ret = (exit_price / entry_price - 1) if side == "BUY" else (entry_price / exit_price - 1)
-                    trades.append({
-                        "symbol": "BTCUSDT",
-                        "entry_ts": entry_ts.isoformat(),
-                        "exit_ts": exit_ts.isoformat(),
-                        "entry_price": entry_price,
-                        "exit_price": exit_price,
-                        "side": side,
-                        "exit_reason": exit_reason,
-                        "return": ret
-                    })
-                    exited = True
-                    break
-                j += 1
-
-            # if not exited until end, close at last close
-            if not exited:
-                last_close = float(df["close"].iloc[-1])
-                exit_price = last_close
-                exit_reason = "EOD"
-                exit_ts = df.index[-1]
-                ret = (exit_price / entry_price - 1) if side == "BUY" else (entry_price / exit_price - 1)
-                trades.append({
-                    "symbol": "BTCUSDT",
-                    "entry_ts": entry_ts.isoformat(),
-                    "exit_ts": exit_ts.isoformat(),
-                    "entry_price": entry_price,
-                    "exit_price": exit_price,
-                    "side": side,
-                    "exit_reason": exit_reason,
-                    "return": ret
-                })
-
-            # skip forward to j (next bar after exit) to avoid re-entering same bar multiple times
-            i = j
+    while i < n:
+        r = rsi[i]
+        if r <= rsi_low:
+            side = 1
+        elif r >= rsi_high:
+            side = -1
+        else:
+            i += 1
             continue
 
-        # else no signal at this bar -> advance
-        i += 1
+        c = closes[i]
+        if side == 1:
+            raw_stop = c * (1.0 - sl_pct)
+            raw_take = c + rr * (c - raw_stop)
+        else:
+            raw_stop = c * (1.0 + sl_pct)
+            raw_take = c - rr * (raw_stop - c)
+        entry_price = _round_half_even(c, 8)
+        stop_price = _round_half_even(raw_stop, 8)
+        take_price = _round_half_even(raw_take, 8)
+
+        exit_price = closes[n - 1]
+        reason = 3  # EOD
+        j = i + 1
+        while j < n:
+            if side == 1:
+                if lows[j] <= stop_price:
+                    exit_price, reason = stop_price, 0
+                    break
+                if highs[j] >= take_price:
+                    exit_price, reason = take_price, 1
+                    break
+                if rsi[j] >= rsi_high:
+                    exit_price, reason = closes[j], 2
+                    break
+            else:
+                if highs[j] >= stop_price:
+                    exit_price, reason = stop_price, 0
+                    break
+                if lows[j] <= take_price:
+                    exit_price, reason = take_price, 1
+                    break
+                if rsi[j] <= rsi_low:
+                    exit_price, reason = closes[j], 2
+                    break
+            j += 1
+
+        entry_i[k] = i
+        exit_j[k] = min(j, n - 1)
+        side_buf[k] = side
+        reason_buf[k] = reason
+        entry_px[k] = entry_price
+        stop_px[k] = stop_price
+        take_px[k] = take_price
+        exit_px[k] = exit_price
+        k += 1
+        # lanjut dari bar exit (tidak re-entry berkali-kali di bar yang sama)
+        i = j
+    return (entry_i[:k], exit_j[:k], side_buf[:k], reason_buf[:k],
+            entry_px[:k], stop_px[:k], take_px[:k], exit_px[:k])
+
+@njit(cache=True)
+def _simulate_nb(rsi, closes, highs, lows, sl_pct, rr, rsi_low, rsi_high):
+    """Satu konfigurasi sweep: trade dari _trades_nb direduksi ke statistik urutan SWEEP_COLUMNS."""
+    _, _, side, _, entry_px, _, _, exit_px = _trades_nb(rsi, closes, highs, lows, sl_pct, rr, rsi_low, rsi_high)
+    n_trades = len(side)
+    n_wins = 0
+    sum_win = 0.0
+    sum_loss = 0.0
+    log_growth = 0.0
+    for k in range(n_trades):
+        if side[k] == 1:
+            ret = exit_px[k] / entry_px[k] - 1.0
+        else:
+            ret = entry_px[k] / exit_px[k] - 1.0
+        if ret > 0.0:
+            n_wins += 1
+            sum_win += ret
+        else:
+            sum_loss += ret
+        log_growth += np.log1p(ret)
 
-    # outputs
-    trades_df = pd.DataFrame(trades)
-    signals_df = pd.DataFrame(signals)
-    trades_df.to_csv(out_dir / "backtest_trades_summary_rr.csv", index=False)
-    signals_df.to_csv(out_dir / "backtest_signals_rr.csv", index=False)
+    out = np.full(6, np.nan)
+    out[0] = n_trades
+    if n_trades > 0:
+        n_losses = n_trades - n_wins
+        out[1] = n_wins / n_trades
+        out[2] = sum_win / n_wins if n_wins > 0 else 0.0
+        out[3] = sum_loss / n_losses if n_losses > 0 else 0.0
+        if n_losses > 0:
+            out[4] = sum_win / -sum_loss
+        out[5] = np.expm1(log_growth)
+    return out
 
-    # compute summary
-    if len(trades_df) > 0:
-        wins = trades_df[trades_df["return"] > 0]
-        losses = trades_df[trades_df["return"] <= 0]
+@njit(parallel=True, cache=True)
+def _sweep_nb(rsi_mat, rsi_row, closes, highs, lows, sl_arr, rr_arr, rsi_low, rsi_high):
+    """Evaluasi semua konfigurasi paralel (prange di sumbu parameter), buffer OHLC dipakai bersama."""
+    n_cfg = len(sl_arr)
+    out = np.empty((n_cfg, 6))
+    for k in prange(n_cfg):
+        out[k] = _simulate_nb(rsi_mat[rsi_row[k]], closes, highs, lows, sl_arr[k], rr_arr[k], rsi_low, rsi_high)
+    return out
+
+def batch_backtest(close, highs, lows, params_grid, rsi_low: float = RSI_LOW, rsi_high: float = RSI_HIGH) -> pd.DataFrame:
+    """
+    Sweep parameter: params_grid = list of (ema_fast, ema_slow, rsi_period, sl_pct, rr).
+    RSI dihitung sekali per rsi_period unik (matriks n_rsi x T), lalu semua konfigurasi
+    dievaluasi dalam satu kernel numba paralel di atas buffer close/high/low yang sama.
+    Catatan: aturan sinyal (detect_signal) hanya memakai RSI, jadi ema_fast/ema_slow
+    ikut dicatat di output tetapi tidak mengubah hasil: konfigurasi dengan
+    (rsi_period, sl_pct, rr) sama hanya disimulasikan sekali lalu statistiknya disalin.
+    Return DataFrame: satu baris per konfigurasi + kolom SWEEP_COLUMNS.
+    """
+    grid = pd.DataFrame(list(params_grid), columns=["ema_fast", "ema_slow", "rsi_period", "sl_pct", "rr"])
+    sim_cols = ["rsi_period", "sl_pct", "rr"]
+    cfg = grid[sim_cols].drop_duplicates()
+    cfg_row = grid.groupby(sim_cols, sort=False).ngroup().to_numpy()  # urutan = cfg (kemunculan pertama)
+    closes = np.ascontiguousarray(close, dtype=np.float64)
+    highs = np.ascontiguousarray(highs, dtype=np.float64)
+    lows = np.ascontiguousarray(lows, dtype=np.float64)
+
+    rsi_periods, rsi_row = np.unique(cfg["rsi_period"].to_numpy(dtype=np.int64), return_inverse=True)
+    rsi_mat = np.empty((len(rsi_periods), len(closes)))
+    for r, period in enumerate(rsi_periods):
+        rsi_mat[r] = rsi_nb(closes, period)
+
+    stats = _sweep_nb(rsi_mat, rsi_row.astype(np.int64), closes, highs, lows,
+                      cfg["sl_pct"].to_numpy(dtype=np.float64), cfg["rr"].to_numpy(dtype=np.float64),
+                      float(rsi_low), float(rsi_high))
+    res = grid.join(pd.DataFrame(stats[cfg_row], columns=list(SWEEP_COLUMNS)))
+    res["n_trades"] = res["n_trades"].astype(np.int64)
+    return res
+
+def run_backtest(data_csv: Path, out_dir: Path, sl_pct: float = None, rr: float = None, debounce_minutes: int = 0, out_format: str = "csv"):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = read_ohlcv(data_csv).set_index("timestamp")  # index datetime64[ns, UTC], terurut
+
+    # defaults from config, di-resolve sekali jadi float lokal (loop di bawah tidak menyentuh config)
+    sl_pct = float(config.SL if sl_pct is None else sl_pct)
+    rr = float(config.RR if rr is None else rr)
+    rsi_period = config.RSI_PERIOD
+
+    # struct-of-arrays: kernel hanya mengindeks array NumPy, df cuma dipakai untuk I/O
+    highs, lows, closes = (df[col].to_numpy(dtype=np.float64) for col in ("high", "low", "close"))
+    ts = df.index.as_unit("ns").asi8  # epoch ns UTC
+
+    # RSI semua bar dihitung sekali, lalu seluruh loop trade di kernel numba (sama dengan sweep)
+    rsi_arr = rsi_nb(closes, rsi_period)
+    entry_i, exit_j, side_buf, reason_buf, entry_price, stop_px, take_px, exit_price = _trades_nb(
+        rsi_arr, closes, highs, lows, sl_pct, rr, float(RSI_LOW), float(RSI_HIGH))
+    # rsi output dibulatkan seperti Signal.to_dict() (hanya bar entry)
+    rsi_buf = np.array([round(float(r), 3) for r in rsi_arr[entry_i]], dtype=np.float64)
+    m = len(entry_i)
+
+    # outputs: array per trade langsung jadi kolom DataFrame
+    sides = np.where(side_buf == 1, "BUY", "SELL").astype(object)
+    entry_ts = iso_utc(ts[entry_i])
+    with np.errstate(divide="ignore"):
+        ret = np.where(side_buf == 1, exit_price / entry_price - 1, entry_price / exit_price - 1)
+    trades_df = pd.DataFrame({
+        "symbol": "BTCUSDT",
+        "entry_ts": entry_ts,
+        "exit_ts": iso_utc(ts[exit_j]),
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "side": sides,
+        "exit_reason": np.array(EXIT_REASONS, dtype=object)[reason_buf],
+        "return": ret,
+    }, index=pd.RangeIndex(m))
+    signals_df = pd.DataFrame({
+        "symbol": "BTCUSDT",
+        "side": sides,
+        "entry_price": entry_price,
+        "entry_ts": entry_ts,
+        "stop_price": stop_px,
+        "take_price": take_px,
+        "sl_pct": sl_pct,
+        "rr": rr,
+        "rsi": rsi_buf,
+        "bar_index": entry_i,
+        "timestamp": entry_ts,
+    }, index=pd.RangeIndex(m))
+    write_frame(trades_df, out_dir / f"backtest_trades_summary_rr.{out_format}")
+    write_frame(signals_df, out_dir / f"backtest_signals_rr.{out_format}")
+
+    # compute summary (array NumPy, tanpa boolean-index DataFrame)
+    if m > 0:
+        is_win = ret > 0
+        n_wins = int(is_win.sum())
+        n_losses = m - n_wins
+        win_sum = float(np.where(is_win, ret, 0.0).sum())
+        loss_sum = float(np.where(is_win, 0.0, ret).sum())
         summary = {
-            "n_trades": int(len(trades_df)),
-            "win_rate": float(len(wins) / len(trades_df)),
-            "avg_win": float(wins["return"].mean()) if len(wins)>0 else 0.0,
-            "avg_loss": float(losses["return"].mean()) if len(losses)>0 else 0.0,
-            "profit_factor": float(wins["return"].sum() / -losses["return"].sum()) if len(losses)>0 else None,
-            "total_return": float((trades_df["return"] + 1.0).prod() - 1.0)
+            "n_trades": int(m),
+            "win_rate": float(n_wins / m),
+            "avg_win": win_sum / n_wins if n_wins > 0 else 0.0,
+            "avg_loss": loss_sum / n_losses if n_losses > 0 else 0.0,
+            "profit_factor": win_sum / -loss_sum if n_losses > 0 else None,
+            # compounding via log-return: stabil untuk run panjang (tidak underflow)
+            "total_return": float(np.expm1(np.log1p(ret).sum()))
         }
     else:
         summary = {"n_trades": 0}
@@ -170,7 +294,28 @@ if __name__ == "__main__":
     p.add_argument("--sl-pct", type=float, default=None)
     p.add_argument("--rr", type=float, default=None)
     p.add_argument("--debounce-minutes", type=int, default=0)
+    p.add_argument("--out-format", choices=["csv", "parquet"], default="csv")
+    p.add_argument("--sweep-rsi-period", type=int, nargs="+", default=None)
+    p.add_argument("--sweep-sl-pct", type=float, nargs="+", default=None)
+    p.add_argument("--sweep-rr", type=float, nargs="+", default=None)
     args = p.parse_args()
 
-    out = run_backtest(Path(args.data_csv), Path(args.out_dir), sl_pct=args.sl_pct, rr=args.rr, debounce_minutes=args.debounce_minutes)
+    sweep_axes = (args.sweep_rsi_period, args.sweep_sl_pct, args.sweep_rr)
+    if any(a is not None for a in sweep_axes):
+        # sweep: semua kombinasi dievaluasi sekaligus, sumbu yang tidak diisi pakai nilai config/CLI
+        # (ema_fast/ema_slow dari config, hanya dicatat di output)
+        defaults = ([config.RSI_PERIOD], [config.SL if args.sl_pct is None else args.sl_pct],
+                    [config.RR if args.rr is None else args.rr])
+        grid = [(config.EMA_FAST, config.EMA_SLOW) + combo
+                for combo in itertools.product(*(a if a is not None else d for a, d in zip(sweep_axes, defaults)))]
+        ohlc = read_ohlcv(Path(args.data_csv))
+        res = batch_backtest(ohlc["close"].to_numpy(), ohlc["high"].to_numpy(), ohlc["low"].to_numpy(), grid)
+        out_dir = Path(args.out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_frame(res, out_dir / f"backtest_sweep_rr.{args.out_format}")
+        print(f"Done. sweep: {len(res)} configs")
+        print(res.sort_values("total_return", ascending=False).head(10).to_string(index=False))
+        sys.exit(0)
+
+    out = run_backtest(Path(args.data_csv), Path(args.out_dir), sl_pct=args.sl_pct, rr=args.rr, debounce_minutes=args.debounce_minutes, out_format=args.out_format)
     print("Done. summary:", out["summary"])
@@ -0,0 +1,59 @@
+# scripts/compile_kernels.py
+"""
+Compile AOT kernel EMA/RSI (numba.pycc) -> extension src/utils/ta_kernels*.so
+
+Jalankan sekali setelah install / update indicators.py:
+    python scripts/compile_kernels.py
+
+src.utils.indicators otomatis memakai ta_kernels bila ada, jadi proses bot
+yang sering restart tidak perlu compile JIT kernel ini di startup.
+Tanpa file .so (belum di-compile / platform lain) indicators kembali ke @njit.
+Exports:
+ - ewm_mean(x, alpha) -> EWM mean adjust=False (= ema_nb dengan alpha = 2/(span+1))
+ - rsi_wilder(x, period) -> RSI Wilder (= rsi_nb)
+ - rolling_mean(x, window, out) -> rolling mean min_periods=1 (kernel sma)
+ - compute_all(close, a_fast, a_slow, rsi_period, ef, es, rsi_out, state)
+     -> kernel gabungan compute_indicators / update_indicators (float64)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+from numba.pycc import CC
+
+repo_root = Path(__file__).resolve().parents[1]
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+
+# kernel @njit dipakai ulang apa adanya -> hasil AOT identik dengan jalur JIT
+from src.utils.indicators import _compute_all, _ewm_mean, _rolling_mean, rsi_nb
+
+cc = CC("ta_kernels")
+cc.output_dir = str(repo_root / "src" / "utils")
+
+
+@cc.export("ewm_mean", "f8[:](f8[:], f8)")
+def ewm_mean(x, alpha):
+    out = np.empty(len(x), dtype=np.float64)
+    _ewm_mean(x, alpha, 1, out)
+    return out
+
+
+@cc.export("rsi_wilder", "f8[:](f8[:], i8)")
+def rsi_wilder(x, period):
+    return rsi_nb(x, period)
+
+
+@cc.export("rolling_mean", "void(f8[:], i8, f8[:])")
+def rolling_mean(x, window, out):
+    _rolling_mean(x, window, out)
+
+
+@cc.export("compute_all", "void(f8[:], f8, f8, i8, f8[:], f8[:], f8[:], f8[:])")
+def compute_all(close, a_fast, a_slow, rsi_period, ef, es, rsi_out, state):
+    _compute_all(close, a_fast, a_slow, rsi_period, ef, es, rsi_out, state)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"[SAVED] AOT kernels -> {cc.output_dir}/{cc.output_file}")
@@ -1,30 +1,39 @@
 # scripts/download_historical.py
 import os
+import asyncio
 from datetime import datetime
-from src.workers.fetcher import create_exchange   # file kamu ✔️
-from src.utils.historical import fetch_full_ohlcv
+from src.workers.fetcher import create_async_exchange   # file kamu ✔️
+from src.utils.historical import fetch_many_ohlcv_async
+from src.utils.frame_io import write_frame
 
 # =============================================================
 # CONFIG — bisa kamu ubah bebas
 # =============================================================
-SYMBOL = "BTC/USDT"
+SYMBOLS = ["BTC/USDT"]  # semua simbol di-fetch bersamaan (async)
 TIMEFRAME = "15m"
+OUTPUT_FORMAT = "csv"  # "csv" | "parquet" (parquet: lebih kecil & cepat dibaca backtest)
 OUTPUT_DIR = "data"
+MAX_CONCURRENCY = 8
+
+async def fetch_all():
+    print(f"Creating Bybit exchange...")
+    ex = create_async_exchange(default_type="spot")
+    try:
+        print(f"Fetching full OHLCV for {', '.join(SYMBOLS)} {TIMEFRAME} ...")
+        return await fetch_many_ohlcv_async(ex, SYMBOLS, TIMEFRAME, max_concurrency=MAX_CONCURRENCY)
+    finally:
+        await ex.close()
 
 # start fetch
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    print(f"Creating Bybit exchange...")
-    ex = create_exchange(default_type="spot")
-
-    print(f"Fetching full OHLCV for {SYMBOL} {TIMEFRAME} ...")
-    df = fetch_full_ohlcv(ex, SYMBOL, TIMEFRAME)
-
-    out_path = f"{OUTPUT_DIR}/historical_{SYMBOL.replace('/', '')}_{TIMEFRAME}.csv"
-    df.to_csv(out_path, index=False)
+    frames = asyncio.run(fetch_all())
 
-    print(f"\n[SAVED] {len(df)} rows → {out_path}\n")
+    for symbol, df in frames.items():
+        out_path = f"{OUTPUT_DIR}/historical_{symbol.replace('/', '')}_{TIMEFRAME}.{OUTPUT_FORMAT}"
+        write_frame(df, out_path)
+        print(f"\n[SAVED] {len(df)} rows → {out_path}\n")
 
 if __name__ == "__main__":
     main()
@@ -2,7 +2,6 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-import csv
 import pandas as pd
 from pathlib import Path
 
@@ -19,11 +18,12 @@ SL_PCT   = 0.004    # jika pakai percent-based SL
 # ---------------------------------------------
 
 # import engine/utils dari project (harus jalan dari repo root)
+from src.utils.frame_io import read_ohlcv, write_frame
 from src.utils.indicators import compute_indicators
-from src.workers.signal_engine import detect_signal
+from src.workers.signal_engine import batch_detect_signal
 
 # load historis
-df = pd.read_csv(HIST_CSV, parse_dates=["timestamp"])
+df = read_ohlcv(HIST_CSV)
 # pastikan kolom timestamp ada
 if "timestamp" not in df.columns:
     # kalau filenya pakai index datetime, coba set index
@@ -33,30 +33,31 @@ if "timestamp" not in df.columns:
     except Exception:
         raise SystemExit("Tidak menemukan kolom 'timestamp' di CSV. Periksa file historical CSV kamu.")
 
-# output csv header
+# output path
 out_path = Path(OUT_CSV)
 out_path.parent.mkdir(parents=True, exist_ok=True)
 
-with out_path.open("w", newline="", encoding="utf-8") as fh:
-    writer = csv.writer(fh)
-    writer.writerow(["symbol","entry_ts","entry_price","signal","stop_price","take_price","sl_pct","rr"])
-
-    # loop incremental: ambil slice dari awal sampai bar i (mirip realtime kenapa engine butuh history)
-    for i in range(len(df)):
-        slice_df = df.iloc[: i+1].copy()
-        # hitung indikator pada slice (sesuai fungsi compute_indicators di project)
-        slice_ind = compute_indicators(slice_df, ema_fast=EMA_FAST, ema_slow=EMA_SLOW, rsi_period=RSI_PER)
-        # panggil detect_signal pada slice (engine harus menerima arg2 ini)
-        sig = detect_signal(slice_ind, SYMBOL, debounce_minutes=DEBOUNCE, fixed_rr=FIXED_RR, sl_pct=SL_PCT)
-        # bila engine mengembalikan dict/obj sinyal -> simpan
-        if sig and isinstance(sig, dict):
-            # ambil fields umum (fall back ke None bila ga ada)
-            entry_ts   = sig.get("entry_ts") or slice_ind["timestamp"].iloc[-1]
-            entry_price= sig.get("entry_price")
-            stop_price = sig.get("stop_price")
-            take_price = sig.get("take_price")
-            sl_pct_out = sig.get("sl_pct", SL_PCT)
-            rr_out     = sig.get("rr", FIXED_RR)
-            writer.writerow([SYMBOL, entry_ts, entry_price, sig.get("side"), stop_price, take_price, sl_pct_out, rr_out])
+# indikator bersifat kausal: hitung sekali pada seluruh history, hasil di bar i
+# sama dengan menghitung ulang pada slice df[:i+1] (mirip realtime)
+ind = compute_indicators(df, ema_fast=EMA_FAST, ema_slow=EMA_SLOW, rsi_period=RSI_PER)
+# deteksi semua bar sekaligus -> {bar_index: sinyal}, isi sama dengan detect_signal per slice
+signals = batch_detect_signal(ind, SYMBOL, fixed_rr=FIXED_RR, sl_pct=SL_PCT)
+
+# kumpulkan kolom lalu tulis sekali di akhir (DEBOUNCE tidak dipakai engine)
+rows = {"symbol": [], "entry_ts": [], "entry_price": [], "signal": [],
+        "stop_price": [], "take_price": [], "sl_pct": [], "rr": []}
+for sig in signals.values():
+    sig = sig.to_dict()  # pembulatan harga/rsi untuk output
+    # ambil fields umum (fall back ke None bila ga ada)
+    rows["symbol"].append(SYMBOL)
+    rows["entry_ts"].append(sig.get("entry_ts"))
+    rows["entry_price"].append(sig.get("entry_price"))
+    rows["signal"].append(sig.get("side"))
+    rows["stop_price"].append(sig.get("stop_price"))
+    rows["take_price"].append(sig.get("take_price"))
+    rows["sl_pct"].append(sig.get("sl_pct", SL_PCT))
+    rows["rr"].append(sig.get("rr", FIXED_RR))
+
+write_frame(pd.DataFrame(rows), out_path)
 
 print(f"[DONE] saved signals -> {out_path}")
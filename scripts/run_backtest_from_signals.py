@@ -2,111 +2,133 @@
 """
 Run backtest using a prepared signal CSV (with entry_ts, entry_price, stop_price, take_price).
 Outputs:
- - trades.csv
+ - trades.csv (or .parquet with --out-format parquet)
  - summary.json
- - equity_curve.csv
+ - equity_curve.csv (or .parquet)
 """
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import argparse
 import json
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from numba import njit
 from datetime import timezone
+from src.utils.frame_io import iso_utc, read_frame, read_ohlcv, write_frame
 
-def load_ohlcv(path):
-    df = pd.read_csv(path, parse_dates=["timestamp"], infer_datetime_format=True)
-    # ensure tz-aware UTC if possible
-    if df["timestamp"].dt.tz is None:
-        df["timestamp"] = df["timestamp"].dt.tz_localize("UTC")
-    return df.set_index("timestamp")
+# kode alasan exit hasil find_exits_batch
+EXIT_NO_DATA, EXIT_SL, EXIT_TP, EXIT_TIMEOUT = 0, 1, 2, 3
+EXIT_REASONS = {EXIT_NO_DATA: "no-data", EXIT_SL: "sl", EXIT_TP: "tp", EXIT_TIMEOUT: "timeout"}
 
-def find_exit(ohlcv_idxed, entry_ts, side, stop_price, take_price):
+@njit(cache=True)
+def find_exits_batch(entry_ts_ns, sides, stops, takes, bar_ts_ns, highs, lows, closes):
     """
-    Starting from entry_ts (inclusive), iterate forward to find first bar where high/low hit TP or SL.
-    Return exit_ts, exit_price, exit_reason ('tp'/'sl'/'timeout').
-    If neither hit until end, use last close as exit (timeout).
+    For each signal, start from entry_ts (inclusive) and scan forward to find first bar where high/low hit TP or SL.
+    sides: 1 = BUY, -1 = SELL. bar_ts_ns must be sorted ascending.
+    Return (exit_idx, exit_price, reason) arrays; reason is one of EXIT_* codes.
+    If neither hit until end, use last close as exit (timeout). exit_idx is -1 for no-data.
     """
-    # slice from entry time
-    window = ohlcv_idxed.loc[entry_ts:]
-    if window.empty:
-        return None, None, "no-data"
-
-    for ts, row in window.iterrows():
-        high = row["high"]
-        low = row["low"]
-        # BUY: TP = take_price higher, SL = stop_price lower
-        if side == "BUY":
-            if low <= stop_price:
-                return ts, stop_price, "sl"
-            if high >= take_price:
-                return ts, take_price, "tp"
-        else:  # SELL: TP lower, SL higher
-            if high >= stop_price:
-                return ts, stop_price, "sl"
-            if low <= take_price:
-                return ts, take_price, "tp"
-    # no hit -> timeout: use last close
-    last_ts = window.index[-1]
-    return last_ts, window.iloc[-1]["close"], "timeout"
+    n_sig = len(entry_ts_ns)
+    n_bar = len(bar_ts_ns)
+    exit_idx = np.full(n_sig, -1, dtype=np.int64)
+    exit_price = np.full(n_sig, np.nan, dtype=np.float64)
+    reason = np.zeros(n_sig, dtype=np.int8)
+
+    starts = np.searchsorted(bar_ts_ns, entry_ts_ns)
+    for k in range(n_sig):
+        start = starts[k]
+        if start >= n_bar:
+            continue  # no-data
+        stop_price = stops[k]
+        take_price = takes[k]
+        for j in range(start, n_bar):
+            # BUY: TP = take_price higher, SL = stop_price lower
+            if sides[k] == 1:
+                if lows[j] <= stop_price:
+                    exit_idx[k], exit_price[k], reason[k] = j, stop_price, EXIT_SL
+                    break
+                if highs[j] >= take_price:
+                    exit_idx[k], exit_price[k], reason[k] = j, take_price, EXIT_TP
+                    break
+            else:  # SELL: TP lower, SL higher
+                if highs[j] >= stop_price:
+                    exit_idx[k], exit_price[k], reason[k] = j, stop_price, EXIT_SL
+                    break
+                if lows[j] <= take_price:
+                    exit_idx[k], exit_price[k], reason[k] = j, take_price, EXIT_TP
+                    break
+        if reason[k] == EXIT_NO_DATA:
+            # no hit -> timeout: use last close
+            exit_idx[k], exit_price[k], reason[k] = n_bar - 1, closes[n_bar - 1], EXIT_TIMEOUT
+    return exit_idx, exit_price, reason
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--signal-csv", required=True)
     p.add_argument("--data-csv", required=True)
     p.add_argument("--out-dir", default="data/backtest_from_signals")
+    p.add_argument("--out-format", choices=["csv", "parquet"], default="csv")
     args = p.parse_args()
 
     out_dir = Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    sig_df = pd.read_csv(args.signal_csv, parse_dates=["entry_ts"], infer_datetime_format=True)
+    sig_df = read_frame(args.signal_csv, parse_dates=["entry_ts"])  # .csv or .parquet
     # ensure tz-aware
     if sig_df["entry_ts"].dt.tz is None:
         sig_df["entry_ts"] = sig_df["entry_ts"].dt.tz_localize("UTC")
 
-    ohlcv = load_ohlcv(args.data_csv)
-
-    trades = []
+    # sorted UTC index: find_exits_batch locates entry bars with np.searchsorted
+    ohlcv = read_ohlcv(args.data_csv).set_index("timestamp")
+
+    bar_index = ohlcv.index
+    sides_col = sig_df["signal"].fillna("").astype(str).str.upper()
+    exit_idx, exit_prices, reasons = find_exits_batch(
+        pd.DatetimeIndex(sig_df["entry_ts"]).as_unit("ns").asi8,
+        np.where(sides_col.to_numpy() == "BUY", 1, -1).astype(np.int8),
+        sig_df["stop_price"].to_numpy(dtype=np.float64),
+        sig_df["take_price"].to_numpy(dtype=np.float64),
+        bar_index.as_unit("ns").asi8,
+        ohlcv["high"].to_numpy(dtype=np.float64),
+        ohlcv["low"].to_numpy(dtype=np.float64),
+        ohlcv["close"].to_numpy(dtype=np.float64),
+    )
+
+    # signal tanpa data bar dilewati; kolom trade diambil langsung dari array (tanpa list of dict)
+    keep = np.flatnonzero(reasons != EXIT_NO_DATA)
+    sides = sides_col.to_numpy()[keep]  # 'BUY' or 'SELL'
+    entry_price = sig_df["entry_price"].to_numpy(dtype=np.float64)[keep]
+    exit_price = exit_prices[keep]
+
+    # compute return (simple)
+    with np.errstate(divide="ignore"):
+        ret = np.where(sides == "BUY", exit_price / entry_price - 1.0, entry_price / exit_price - 1.0)
+
+    # assume fixed position sizing (e.g. 1 contract) -> compute pnl in %
+    trades_df = pd.DataFrame({
+        "symbol": sig_df["symbol"].to_numpy()[keep],
+        "entry_ts": iso_utc(pd.DatetimeIndex(sig_df["entry_ts"]).as_unit("ns").asi8[keep]),
+        "exit_ts": iso_utc(bar_index.as_unit("ns").asi8[exit_idx[keep]]),
+        "side": sides,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "return": ret,
+        "reason": pd.Series(reasons[keep]).map(EXIT_REASONS).to_numpy(),
+    })
+    trades_path = out_dir / f"trades.{args.out_format}"
+    equity_path = out_dir / f"equity_curve.{args.out_format}"
+    write_frame(trades_df, trades_path)
+
+    # simple equity (apply each return on balance, compounded in trade order)
     balance = 10000.0
-    equity = []
-    for i, r in sig_df.iterrows():
-        sym = r["symbol"]
-        entry_ts = r["entry_ts"]
-        entry_price = float(r["entry_price"])
-        side = r.get("signal", "").upper()  # 'BUY' or 'SELL'
-        stop_price = float(r["stop_price"])
-        take_price = float(r["take_price"])
-        sl_pct = float(r.get("sl_pct", 0.01))
-        rr = float(r.get("rr", 1.0))
-
-        exit_ts, exit_price, reason = find_exit(ohlcv, entry_ts, side, stop_price, take_price)
-        if exit_ts is None:
-            continue
-
-        # compute return (simple)
-        if side == "BUY":
-            ret = (exit_price / entry_price) - 1.0
-        else:
-            ret = (entry_price / exit_price) - 1.0
-
-        # assume fixed position sizing (e.g. 1 contract) -> compute pnl in %
-        trades.append({
-            "symbol": sym,
-            "entry_ts": entry_ts.isoformat(),
-            "exit_ts": getattr(exit_ts, "isoformat", lambda: str(exit_ts))(),
-            "side": side,
-            "entry_price": entry_price,
-            "exit_price": exit_price,
-            "return": ret,
-            "reason": reason
-        })
-
-        # update simple equity (apply return on balance)
-        balance = balance * (1.0 + ret)
-        equity.append({"timestamp": exit_ts.isoformat(), "equity": balance})
-
-    trades_df = pd.DataFrame(trades)
-    trades_df.to_csv(out_dir / "trades.csv", index=False)
+    eq_df = pd.DataFrame()
+    if not trades_df.empty:
+        rets = trades_df["return"].to_numpy(dtype=np.float64)
+        equity_arr = np.cumprod(np.concatenate(([balance], 1.0 + rets)))[1:]
+        balance = float(equity_arr[-1])
+        eq_df = pd.DataFrame({"timestamp": trades_df["exit_ts"].to_numpy(), "equity": equity_arr})
 
     # summary
     if not trades_df.empty:
@@ -126,13 +148,12 @@ def main():
     with open(out_dir / "summary.json", "w") as fh:
         json.dump(summary, fh, indent=2)
 
-    eq_df = pd.DataFrame(equity)
     if not eq_df.empty:
-        eq_df.to_csv(out_dir / "equity_curve.csv", index=False)
+        write_frame(eq_df, equity_path)
 
-    print("[SAVED]", "trades ->", out_dir / "trades.csv")
+    print("[SAVED]", "trades ->", trades_path)
     print("[SAVED]", "summary ->", out_dir / "summary.json")
-    print("[SAVED]", "equity ->", out_dir / "equity_curve.csv")
+    print("[SAVED]", "equity ->", equity_path)
 
 if __name__ == "__main__":
     main()
@@ -1,70 +1,149 @@
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 DB_PATH = "signals.db"
 
+# WAL: reader tidak blok writer, synchronous=NORMAL -> fsync hanya saat checkpoint
+# cache_size negatif = KiB -> 64 MiB page cache agar btree tetap hangat
+_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA busy_timeout=5000;
+PRAGMA cache_size=-65536;
+"""
+
+# STRICT: tipe kolom ditegakkan; waktu disimpan sebagai epoch ms INTEGER (8 byte, bukan ISO ~25 byte)
+# (butuh SQLite >= 3.37)
+_CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price REAL NOT NULL,
+    ts_ms INTEGER NOT NULL
+) STRICT;
+"""
+
+_INSERT_SQL = "INSERT INTO signals (symbol, side, price, ts_ms) VALUES (?, ?, ?, ?)"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _ms_to_iso(ts_ms: int) -> str:
+    """epoch ms -> ISO UTC, mis. 2025-01-03T02:30:00.123000+00:00"""
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).isoformat()
+
+
+def _iso_to_ms(ts: str) -> int:
+    """ISO -> epoch ms; string tanpa offset dianggap UTC (bukan zona waktu host)."""
+    dt = datetime.fromisoformat(ts)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
 
 class Storage:
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        # koneksi dipakai bersama antar thread: semua akses lewat lock ini, dan transaksi
+        # memegangnya sampai COMMIT/ROLLBACK (re-entry hanya dari thread pemilik)
+        self._lock = threading.RLock()
         self._init_db()
 
     def _connect(self):
-        return sqlite3.connect(self.db_path)
+        # isolation_level=None: autocommit, transaksi diatur manual (BEGIN/COMMIT)
+        return sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
 
     def _init_db(self):
-        conn = self._connect()
-        cur = conn.cursor()
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS signals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            symbol TEXT NOT NULL,
-            side TEXT NOT NULL,
-            price REAL NOT NULL,
-            timestamp TEXT NOT NULL
-        );
-        """)
-
-        conn.commit()
-        conn.close()
+        # satu koneksi dipakai selama umur Storage (tanpa connect/close per query)
+        self.conn = self._connect()
+        self._last_sql = "SELECT symbol, side, price, ts_ms FROM signals WHERE symbol = ? ORDER BY id DESC LIMIT 1"
+        cur = self.conn.cursor()
+        cur.executescript(_PRAGMAS)
+
+        self._migrate_text_timestamp()
+        cur.execute(_CREATE_SQL)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_signals_symbol_id ON signals(symbol, id DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_symbol_ts ON signals(symbol, ts_ms DESC)")
+
+    def _migrate_text_timestamp(self):
+        """DB lama (kolom timestamp TEXT ISO) -> tabel STRICT dengan ts_ms, id tetap."""
+        cols = [r[1] for r in self.conn.execute("PRAGMA table_info(signals)")]
+        if "timestamp" not in cols:
+            return
+        rows = [
+            (id_, symbol, side, price, _iso_to_ms(ts))
+            for id_, symbol, side, price, ts in self.conn.execute(
+                "SELECT id, symbol, side, price, timestamp FROM signals")
+        ]
+        with self.transaction():
+            self.conn.execute("ALTER TABLE signals RENAME TO signals_old")
+            self.conn.execute("DROP INDEX IF EXISTS idx_signals_symbol_id")
+            self.conn.execute(_CREATE_SQL)
+            self.conn.executemany("INSERT INTO signals (id, symbol, side, price, ts_ms) VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.execute("DROP TABLE signals_old")
+
+    def close(self):
+        self.conn.close()
 
     def save_signal(self, symbol: str, side: str, price: float):
-        conn = self._connect()
-        cur = conn.cursor()
-
-        # gunakan timestamp UTC timezone-aware
-        from datetime import datetime, timezone
-        ts = datetime.now(timezone.utc).isoformat()  # ex: 2025-01-03T02:30:00+00:00
-
-        cur.execute("""
-            INSERT INTO signals (symbol, side, price, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (symbol, side, price, ts))
-
-        conn.commit()
-        conn.close()
+        # waktu simpan: epoch ms UTC
+        with self._lock:
+            self.conn.execute(_INSERT_SQL, (symbol, side, price, _now_ms()))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Kelompokkan beberapa write dalam satu transaksi (satu COMMIT), mis.:
+            with storage.transaction():
+                storage.save_signal(...)
+                storage.save_signal(...)
+        BEGIN IMMEDIATE mengambil write lock di awal (tidak gagal di tengah karena upgrade lock).
+        Lock dipegang selama blok: thread lain menunggu, tidak ikut transaksi ini.
+        Transaksi bersarang di thread yang sama ikut transaksi luar.
+        """
+        with self._lock:
+            if self.conn.in_transaction:
+                yield
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self.conn.execute("COMMIT")
+            except BaseException:
+                # termasuk COMMIT gagal: jangan biarkan transaksi menggantung
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise
+
+    def save_signals_bulk(self, rows):
+        """
+        Simpan banyak sinyal sekaligus: rows = iterable of (symbol, side, price).
+        Satu transaksi (satu commit/fsync) untuk seluruh batch, timestamp dihitung sekali.
+        """
+        ts = _now_ms()
+        params = [(symbol, side, price, ts) for symbol, side, price in rows]
+        if not params:
+            return
+        with self.transaction():
+            self.conn.executemany(_INSERT_SQL, params)
 
     def get_last_signal(self, symbol: str):
-        conn = self._connect()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT symbol, side, price, timestamp
-            FROM signals
-            WHERE symbol = ?
-            ORDER BY id DESC LIMIT 1
-        """, (symbol,))
-
-        row = cur.fetchone()
-        conn.close()
-
+        """
+        Sinyal terakhir untuk symbol: dict symbol, side, price, timestamp (ISO UTC),
+        plus ts_ms (epoch ms) bagi pemanggil yang butuh angka.
+        """
+        # index (symbol, id DESC) -> lookup O(log n), SQL string sama tiap panggilan (statement cache sqlite3)
+        with self._lock:
+            row = self.conn.execute(self._last_sql, (symbol,)).fetchone()
         if row:
-            return {
-                "symbol": row[0],
-                "side": row[1],
-                "price": row[2],
-                "timestamp": row[3]
-            }
+            symbol, side, price, ts_ms = row
+            return {"symbol": symbol, "side": side, "price": price,
+                    "timestamp": _ms_to_iso(ts_ms), "ts_ms": ts_ms}
         return None
-
@@ -0,0 +1,85 @@
+# src/utils/frame_io.py
+"""
+Helper baca/tulis DataFrame untuk script backtest & downloader.
+Format ditentukan dari ekstensi path:
+ - .parquet -> Parquet (pyarrow, kompresi zstd): tulis/baca jauh lebih cepat,
+               file lebih kecil, dan tipe kolom (datetime UTC, float) tetap utuh.
+ - lainnya  -> CSV via pandas (format lama, tetap kompatibel).
+Functions:
+ - write_frame(df, path) / read_frame(path, **csv_kwargs)
+ - read_ohlcv(path) -> DataFrame OHLCV, kolom timestamp datetime64[ns, UTC], terurut
+ - iso_utc(ts_ns) -> array string ISO (format Timestamp.isoformat()) untuk kolom output
+Notes:
+ - CSV tetap ditulis oleh pandas: pyarrow.csv.write_csv membulatkan float
+   (mis. 0.0040000000000000036 -> 0.004) dan mengutip semua kolom string.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+def is_parquet(path) -> bool:
+    return Path(path).suffix.lower() in PARQUET_SUFFIXES
+
+
+def write_frame(df: pd.DataFrame, path, index: bool = False) -> None:
+    """Tulis df ke CSV atau Parquet sesuai ekstensi path."""
+    if is_parquet(path):
+        df.to_parquet(path, engine="pyarrow", compression="zstd", index=index)
+    else:
+        df.to_csv(path, index=index)
+
+
+def read_frame(path, **csv_kwargs) -> pd.DataFrame:
+    """Baca CSV atau Parquet sesuai ekstensi path. csv_kwargs hanya dipakai untuk CSV."""
+    if is_parquet(path):
+        return pd.read_parquet(path, engine="pyarrow")
+    return pd.read_csv(path, **csv_kwargs)
+
+
+def read_ohlcv(path) -> pd.DataFrame:
+    """
+    Baca file OHLCV (CSV atau Parquet) dengan kolom 'timestamp' sebagai
+    datetime64[ns, UTC], terurut naik berdasarkan timestamp.
+    Untuk CSV, parsing tanggal + zona waktu dilakukan sekali oleh pyarrow
+    (schema bertipe timestamp[ns, UTC]); timestamp tanpa offset dianggap UTC.
+    """
+    if is_parquet(path):
+        df = pd.read_parquet(path, engine="pyarrow")
+        if "timestamp" in df.columns:
+            df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    else:
+        try:
+            df = _read_csv_typed(path, pa.timestamp("ns", tz="UTC"))
+        except pa.ArrowInvalid:
+            # mis. '2025-01-01 00:00:00' (tanpa offset zona) -> parse naive, lalu set UTC
+            df = _read_csv_typed(path, pa.timestamp("ns"))
+            df["timestamp"] = df["timestamp"].dt.tz_localize("UTC")
+
+    if "timestamp" in df.columns and not df["timestamp"].is_monotonic_increasing:
+        df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    return df
+
+
+def iso_utc(ts_ns) -> np.ndarray:
+    """
+    epoch ns (UTC) -> array object berisi string ISO, sama dengan
+    pd.Timestamp(t, tz="UTC").isoformat(), mis. 2025-01-01T00:00:00+00:00.
+    Bar tanpa pecahan detik (kasus normal OHLCV) diformat sekaligus oleh NumPy.
+    """
+    ts_ns = np.asarray(ts_ns, dtype=np.int64)
+    if (ts_ns % 1_000_000_000 == 0).all():
+        s = np.datetime_as_string(ts_ns.view("datetime64[ns]"), unit="s")
+        return np.char.add(s, "+00:00").astype(object)
+    return np.array([pd.Timestamp(int(t), tz="UTC").isoformat() for t in ts_ns], dtype=object)
+
+
+def _read_csv_typed(path, ts_type: pa.DataType) -> pd.DataFrame:
+    opts = pacsv.ConvertOptions(column_types={"timestamp": ts_type})
+    return pacsv.read_csv(path, convert_options=opts).to_pandas()
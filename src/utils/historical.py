@@ -1,11 +1,22 @@
 # src/utils/historical.py
+import asyncio
 import time
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 
 # =================================================================
 # Convert timeframe to milliseconds
 # =================================================================
+# timeframe umum -> langsung lookup tanpa parsing
+_TF_MS = {"1m": 60000, "5m": 300000, "15m": 900000, "1h": 3600000, "4h": 14400000, "1d": 86400000}
+
+
+@lru_cache(maxsize=32)
 def timeframe_to_ms(timeframe: str) -> int:
+    ms = _TF_MS.get(timeframe)
+    if ms is not None:
+        return ms
     unit = timeframe[-1]
     n = int(timeframe[:-1])
     if unit == "m":
@@ -16,6 +27,57 @@ def timeframe_to_ms(timeframe: str) -> int:
         return n * 24 * 60 * 60 * 1000
     raise ValueError(f"Unsupported timeframe: {timeframe}")
 
+# =================================================================
+# Helpers (dipakai versi sync & async)
+# =================================================================
+def _default_since() -> int:
+    # mulai dari 2020, aman untuk semua coin baru-lama
+    return int(pd.Timestamp("2025-01-01", tz="UTC").timestamp() * 1000)
+
+
+def _new_buffer(now_ms: int, since: int, ms_per_bar: int, limit_per_call: int) -> np.ndarray:
+    # buffer float64 (row-major, 6 kolom) dengan kapasitas perkiraan jumlah bar
+    cap = max(1024, (now_ms - since) // ms_per_bar + limit_per_call)
+    return np.empty((cap, 6), dtype=np.float64)
+
+
+def _append_page(buf: np.ndarray, n: int, ohlcv):
+    """Copy satu page ke buffer (kapasitas digandakan jika kurang). Return (buf, n)."""
+    arr = np.asarray(ohlcv, dtype=np.float64)
+    k = len(arr)
+    if n + k > len(buf):
+        grown = np.empty((max(len(buf) * 2, n + k), 6), dtype=np.float64)
+        grown[:n] = buf[:n]
+        buf = grown
+    buf[n:n + k] = arr
+    return buf, n + k
+
+
+def _log_page(symbol: str, ohlcv):
+    oldest = ohlcv[0][0]
+    newest = ohlcv[-1][0]
+    print(
+        f"[{symbol}] Fetched {len(ohlcv)} rows | "
+        f"From {pd.to_datetime(oldest, unit='ms')} "
+        f"to {pd.to_datetime(newest, unit='ms')}"
+    )
+
+
+def _to_frame(buf: np.ndarray, n: int) -> pd.DataFrame:
+    # dedup + sort pada timestamp int64 (ms), sebelum konversi ke datetime
+    ts = buf[:n, 0].astype(np.int64)
+    rows = buf[:n]
+    if not (ts[1:] > ts[:-1]).all():
+        # ada duplikat / urutan acak -> np.unique: terurut, ambil kemunculan pertama
+        _, first = np.unique(ts, return_index=True)
+        ts, rows = ts[first], rows[first]
+    # else: page normal sudah naik ketat -> tanpa sort & gather
+
+    # convert → DataFrame, timestamp dikonversi sekali ke datetime UTC
+    df = pd.DataFrame(rows[:, 1:], columns=["open", "high", "low", "close", "volume"])
+    df.insert(0, "timestamp", pd.to_datetime(ts, unit="ms", utc=True))
+    return df
+
 # =================================================================
 # FULL HISTORICAL FETCHER
 # =================================================================
@@ -32,19 +94,27 @@ def fetch_full_ohlcv(
     """
 
     ms_per_bar = timeframe_to_ms(timeframe)
-    all_rows = []
 
     # Default start date jika tidak diberi
     if since is None:
-        # mulai dari 2020, aman untuk semua coin baru-lama
-        since = int(pd.Timestamp("2025-01-01", tz="UTC").timestamp() * 1000)
+        since = _default_since()
 
     now_ms = exchange.milliseconds()
     fetch_since = since
 
+    # tiap page langsung di-copy ke buffer float64
+    buf = _new_buffer(now_ms, since, ms_per_bar, limit_per_call)
+    n = 0
+
     print(f"[START] Fetching {symbol} | TF={timeframe} | Start={pd.to_datetime(fetch_since, unit='ms')}")
 
+    # jeda antar page: throttler ccxt (enableRateLimit=True di create_exchange) sudah mengatur;
+    # exchange tanpa throttler dijeda manual sebesar sisa rateLimit
+    self_pace = not getattr(exchange, "enableRateLimit", False)
+    min_interval = getattr(exchange, "rateLimit", 0) / 1000.0
+
     while True:
+        started = time.monotonic()
         try:
             ohlcv = exchange.fetch_ohlcv(
                 symbol,
@@ -61,19 +131,11 @@ def fetch_full_ohlcv(
             print("No more data returned.")
             break
 
-        all_rows.extend(ohlcv)
-
-        oldest = ohlcv[0][0]
-        newest = ohlcv[-1][0]
-
-        print(
-            f"Fetched {len(ohlcv)} rows | "
-            f"From {pd.to_datetime(oldest, unit='ms')} "
-            f"to {pd.to_datetime(newest, unit='ms')}"
-        )
+        buf, n = _append_page(buf, n, ohlcv)
+        _log_page(symbol, ohlcv)
 
         # maju ke next page
-        fetch_since = newest + 1
+        fetch_since = ohlcv[-1][0] + 1
 
         # stop jika sudah mendekati sekarang
         if fetch_since >= now_ms:
@@ -81,19 +143,85 @@ def fetch_full_ohlcv(
             break
 
         # rate limit
-        time.sleep(0.35)  # aman untuk bybit (rateLimit auto)
+        if self_pace:
+            time.sleep(max(0.0, min_interval - (time.monotonic() - started)))
 
-    # convert → DataFrame
-    df = pd.DataFrame(
-        all_rows,
-        columns=["timestamp", "open", "high", "low", "close", "volume"],
-    )
+    df = _to_frame(buf, n)
+    print(f"[DONE] Total bars fetched: {len(df)}")
+    return df
+
+# =================================================================
+# ASYNC MULTI-SYMBOL FETCHER
+# =================================================================
+async def fetch_full_ohlcv_async(
+    exchange,
+    symbol: str,
+    timeframe: str = "15m",
+    since: int = None,
+    limit_per_call: int = 1000,
+):
+    """
+    Versi async fetch_full_ohlcv untuk exchange dari ccxt.async_support.
+    Pagination per simbol tetap berurutan; jeda antar request diatur throttler ccxt
+    (enableRateLimit=True, dibagi semua task pada instance exchange yang sama).
+    """
+    ms_per_bar = timeframe_to_ms(timeframe)
+    if since is None:
+        since = _default_since()
+
+    now_ms = exchange.milliseconds()
+    fetch_since = since
+    buf = _new_buffer(now_ms, since, ms_per_bar, limit_per_call)
+    n = 0
+
+    print(f"[START] Fetching {symbol} | TF={timeframe} | Start={pd.to_datetime(fetch_since, unit='ms')}")
 
-    # to datetime UTC
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
+    while True:
+        try:
+            ohlcv = await exchange.fetch_ohlcv(
+                symbol,
+                timeframe=timeframe,
+                since=fetch_since,
+                limit=limit_per_call
+            )
+        except Exception as e:
+            print(f"[{symbol}] Error fetching:", e)
+            await asyncio.sleep(2)
+            continue
 
-    # dedup + sort
-    df = df.drop_duplicates(subset="timestamp").sort_values("timestamp").reset_index(drop=True)
+        if not ohlcv:
+            break
 
-    print(f"[DONE] Total bars fetched: {len(df)}")
+        buf, n = _append_page(buf, n, ohlcv)
+        _log_page(symbol, ohlcv)
+
+        fetch_since = ohlcv[-1][0] + 1
+        if fetch_since >= now_ms:
+            break
+
+    df = _to_frame(buf, n)
+    print(f"[DONE] {symbol}: total bars fetched: {len(df)}")
     return df
+
+
+async def fetch_many_ohlcv_async(
+    exchange,
+    symbols,
+    timeframe: str = "15m",
+    since: int = None,
+    limit_per_call: int = 1000,
+    max_concurrency: int = 8,
+):
+    """
+    Fetch banyak simbol bersamaan (maks max_concurrency simbol aktif sekaligus).
+    Return: dict {symbol: DataFrame OHLCV}
+    """
+    symbols = list(symbols)  # dipakai dua kali (gather + zip); generator akan habis
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def one(sym):
+        async with sem:
+            return await fetch_full_ohlcv_async(exchange, sym, timeframe, since, limit_per_call)
+
+    results = await asyncio.gather(*(one(s) for s in symbols))
+    return dict(zip(symbols, results))
@@ -1,39 +1,260 @@
 # src/utils/indicators.py
 """
-Simple indicator helpers (pandas-only).
+Simple indicator helpers (pandas + numba kernels).
 Functions:
  - ema(series, span) -> pd.Series
- - sma(series, window) -> pd.Series
+ - ema_nb(close, span) -> np.ndarray (kernel numba, dipakai ema() dan signal_engine_nb)
+ - sma(series, window) -> pd.Series (rolling mean, kernel numba)
  - rsi(series, period) -> pd.Series
+ - rsi_nb(close, period) -> np.ndarray (kernel numba, dipakai rsi() dan signal_engine_nb)
  - compute_indicators(df, close_col='close', ema_fast=9, ema_slow=21, rsi_period=14)
-    -> returns df copy with columns: ema_fast, ema_slow, rsi
+    -> returns shallow df copy with columns: ema_fast, ema_slow, rsi
+ - update_indicators(df_new_bars, symbol, ...) -> indikator bar baru saja (state per symbol)
 Notes:
  - Expects a pandas.DataFrame with a 'close' column (or name supplied).
  - No TA-Lib dependency.
+ - Jika src/utils/ta_kernels (AOT, python scripts/compile_kernels.py) ada, ema/rsi/compute_indicators
+   /sma (float64) memakainya; jika tidak, kernel @njit di bawah. Compile ulang setelah kernel diubah.
 """
 
 from __future__ import annotations
 import pandas as pd
 import numpy as np
+from numba import njit
+
+try:
+    # kernel AOT hasil scripts/compile_kernels.py: tanpa compile JIT saat proses start
+    from src.utils import ta_kernels as _aot
+    # .so lama (sebelum semua kernel diekspor) -> abaikan, pakai @njit
+    if not all(hasattr(_aot, f) for f in ("ewm_mean", "rsi_wilder", "rolling_mean", "compute_all")):
+        _aot = None
+except ImportError:
+    _aot = None
+
+
+@njit(cache=True, inline="always")
+def _ewm_step(weighted, old_wt, old_wt_factor, alpha, cur):
+    """
+    Satu langkah EWM mean (adjust=False) dengan semantik pandas: update dibagi total bobot,
+    bobot lama meluruh tiap bar termasuk bar NaN (ignore_na=False). Return (weighted, old_wt).
+    """
+    if weighted == weighted:
+        old_wt *= old_wt_factor
+        if cur == cur:
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+    elif cur == cur:
+        weighted = cur
+    return weighted, old_wt
+
+
+@njit(cache=True, inline="always")
+def _rsi_value(avg_gain, avg_loss):
+    """100 - 100/(1+rs); rs=inf -> 100, 0/0 -> 0.0 (seperti pandas + fillna(0))."""
+    if avg_loss != 0.0:
+        return 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    if avg_gain > 0.0:
+        return 100.0
+    return 0.0
+
+
+@njit(cache=True)
+def _ewm_mean(x, alpha, min_periods, out):
+    """EWM mean (adjust=False) ditulis ke out (in place), semantik NaN/min_periods seperti pandas."""
+    old_wt_factor = 1.0 - alpha
+    old_wt = 1.0
+    weighted = np.nan
+    nobs = 0
+    for i in range(len(x)):
+        cur = x[i]
+        if cur == cur:
+            nobs += 1
+        weighted, old_wt = _ewm_step(weighted, old_wt, old_wt_factor, alpha, cur)
+        out[i] = weighted if nobs >= min_periods else np.nan
+
+
+@njit(cache=True)
+def ema_nb(close, span):
+    """Exponential moving average (ewm(span=span, adjust=False).mean()) untuk array float64."""
+    out = np.empty(len(close), dtype=np.float64)
+    _ewm_mean(close, 2.0 / (span + 1.0), 1, out)
+    return out
+
+
+def _require_ge1(name: str, value) -> None:
+    """span/period/window harus >= 1 (ValueError seperti validasi pandas ewm/rolling)."""
+    if value < 1:
+        raise ValueError(f"{name} must satisfy: {name} >= 1 (got {value})")
 
 
 def ema(series: pd.Series, span: int) -> pd.Series:
     """
-    Exponential moving average. Uses pandas ewm.
+    Exponential moving average (kernel numba, hasil sama dengan pandas ewm(adjust=False)).
     Returns a series aligned with the input index.
     """
+    _require_ge1("span", span)
     if series is None or len(series) == 0:
         return pd.Series(dtype="float64", index=series.index if series is not None else None)
-    return series.ewm(span=span, adjust=False).mean()
+    x = series.to_numpy(dtype=np.float64)
+    out = _aot.ewm_mean(x, 2.0 / (span + 1.0)) if _aot is not None else ema_nb(x, span)
+    return pd.Series(out, index=series.index, name=series.name)
+
+
+@njit(cache=True)
+def _rolling_mean(x, window, out):
+    """
+    Rolling mean window tetap (min_periods=1) dalam satu pass O(n): tambah nilai masuk,
+    kurangi nilai keluar, dengan kompensasi Kahan (tanpa cancellation seperti cumsum biasa).
+    NaN diabaikan; urutan operasi mengikuti rolling().mean() pandas -> hasil identik.
+    """
+    nobs = 0
+    neg_ct = 0
+    sum_x = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    same_ct = 0
+    prev_value = np.nan
+    for i in range(len(x)):
+        # nilai keluar dari window
+        if i >= window:
+            val = x[i - window]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if np.signbit(val):
+                    neg_ct -= 1
+        # nilai masuk
+        val = x[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if np.signbit(val):
+                neg_ct += 1
+            if val == prev_value:
+                same_ct += 1
+            else:
+                same_ct = 1
+            prev_value = val
+
+        if nobs > 0:
+            result = sum_x / nobs
+            if same_ct >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0.0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0.0:
+                result = 0.0
+            out[i] = result
+        else:
+            out[i] = np.nan
 
 
 def sma(series: pd.Series, window: int) -> pd.Series:
     """
-    Simple moving average.
+    Simple moving average (min_periods=1), kernel numba O(n).
     """
+    _require_ge1("window", window)  # kernel tidak cek batas index
     if series is None or len(series) == 0:
         return pd.Series(dtype="float64", index=series.index if series is not None else None)
-    return series.rolling(window=window, min_periods=1).mean()
+    x = series.to_numpy(dtype=np.float64)
+    out = np.empty(len(x), dtype=np.float64)
+    (_aot.rolling_mean if _aot is not None else _rolling_mean)(x, window, out)
+    return pd.Series(out, index=series.index, name=series.name)
+
+
+@njit(cache=True)
+def rsi_nb(close, period):
+    """
+    RSI Wilder dalam satu pass: avg_gain & avg_loss di-update bersamaan (tanpa array up/down).
+    Semantik sama dengan versi pandas: ewm(alpha=1/period, adjust=False, min_periods=period)
+    pada diff(), update dibagi total bobot, lalu fillna(0.0) -> hasil identik.
+    """
+    n = len(close)
+    out = np.zeros(n, dtype=np.float64)
+    alpha = 1.0 / period
+    old_wt_factor = 1.0 - alpha
+    avg_gain, gain_wt = np.nan, 1.0
+    avg_loss, loss_wt = np.nan, 1.0
+    nobs = 0
+    for i in range(1, n):
+        d = close[i] - close[i - 1]
+        if d == d:
+            nobs += 1
+            gain = d if d > 0.0 else 0.0
+            loss = -d if d < 0.0 else 0.0
+        else:
+            gain = loss = np.nan
+        avg_gain, gain_wt = _ewm_step(avg_gain, gain_wt, old_wt_factor, alpha, gain)
+        avg_loss, loss_wt = _ewm_step(avg_loss, loss_wt, old_wt_factor, alpha, loss)
+        if nobs >= period:
+            out[i] = _rsi_value(avg_gain, avg_loss)
+    return out
+
+
+# layout state kernel _compute_all (array float64, dibawa antar panggilan untuk update incremental)
+_ST_FAST, _ST_FAST_WT, _ST_SLOW, _ST_SLOW_WT, _ST_GAIN, _ST_GAIN_WT, _ST_LOSS, _ST_LOSS_WT, _ST_NOBS, _ST_PREV = range(10)
+
+
+def _new_state() -> np.ndarray:
+    """State awal (belum ada bar): rata-rata NaN, bobot 1, prev close NaN."""
+    return np.array([np.nan, 1.0, np.nan, 1.0, np.nan, 1.0, np.nan, 1.0, 0.0, np.nan])
+
+
+@njit(cache=True)
+def _compute_all(close, a_fast, a_slow, rsi_period, ef, es, rsi_out, state):
+    """
+    ema_fast, ema_slow, dan RSI Wilder dalam satu loop atas close (4 state EWM berjalan bersama).
+    Hasil per kolom identik dengan ema_nb / rsi_nb. state dibaca di awal & ditulis di akhir,
+    jadi memproses data bertahap (bar baru saja) = hasil yang sama dengan sekali jalan.
+    """
+    n = len(close)
+    f_factor = 1.0 - a_fast
+    s_factor = 1.0 - a_slow
+    a_w = 1.0 / rsi_period
+    w_factor = 1.0 - a_w
+    fast, fast_wt = state[_ST_FAST], state[_ST_FAST_WT]
+    slow, slow_wt = state[_ST_SLOW], state[_ST_SLOW_WT]
+    avg_gain, gain_wt = state[_ST_GAIN], state[_ST_GAIN_WT]
+    avg_loss, loss_wt = state[_ST_LOSS], state[_ST_LOSS_WT]
+    nobs = int(state[_ST_NOBS])
+    prev = state[_ST_PREV]
+    for i in range(n):
+        cur = close[i]
+        fast, fast_wt = _ewm_step(fast, fast_wt, f_factor, a_fast, cur)
+        slow, slow_wt = _ewm_step(slow, slow_wt, s_factor, a_slow, cur)
+        ef[i] = fast
+        es[i] = slow
+
+        # bar pertama: prev NaN -> d NaN -> tidak ada observasi (sama dengan diff() pandas)
+        d = cur - prev
+        if d == d:
+            nobs += 1
+            gain = d if d > 0.0 else 0.0
+            loss = -d if d < 0.0 else 0.0
+        else:
+            gain = loss = np.nan
+        avg_gain, gain_wt = _ewm_step(avg_gain, gain_wt, w_factor, a_w, gain)
+        avg_loss, loss_wt = _ewm_step(avg_loss, loss_wt, w_factor, a_w, loss)
+        rsi_out[i] = _rsi_value(avg_gain, avg_loss) if nobs >= rsi_period else 0.0
+        prev = cur
+
+    state[_ST_FAST], state[_ST_FAST_WT] = fast, fast_wt
+    state[_ST_SLOW], state[_ST_SLOW_WT] = slow, slow_wt
+    state[_ST_GAIN], state[_ST_GAIN_WT] = avg_gain, gain_wt
+    state[_ST_LOSS], state[_ST_LOSS_WT] = avg_loss, loss_wt
+    state[_ST_NOBS] = nobs
+    state[_ST_PREV] = prev
+
+
+# float64 -> kernel AOT bila tersedia (float32 selalu lewat @njit)
+_compute_all_f8 = _aot.compute_all if _aot is not None else _compute_all
 
 
 def rsi(series: pd.Series, period: int = 14) -> pd.Series:
@@ -41,21 +262,13 @@ def rsi(series: pd.Series, period: int = 14) -> pd.Series:
     Relative Strength Index (RSI) using Wilder's smoothing (EMA-like).
     Returns a series aligned with the input index. Produces values in [0,100].
     """
+    _require_ge1("period", period)
     if series is None or len(series) == 0:
         return pd.Series(dtype="float64", index=series.index if series is not None else None)
 
-    delta = series.diff()
-    up = delta.clip(lower=0.0)
-    down = -1 * delta.clip(upper=0.0)
-
-    # Wilder's smoothing: use exponential weighted moving average with alpha = 1/period
-    roll_up = up.ewm(alpha=1.0/period, adjust=False, min_periods=period).mean()
-    roll_down = down.ewm(alpha=1.0/period, adjust=False, min_periods=period).mean()
-
-    rs = roll_up / roll_down
-    rsi = 100.0 - (100.0 / (1.0 + rs))
-    rsi = rsi.fillna(0.0)
-    return rsi
+    x = series.to_numpy(dtype=np.float64)
+    out = _aot.rsi_wilder(x, period) if _aot is not None else rsi_nb(x, period)
+    return pd.Series(out, index=series.index, name=series.name)
 
 
 def compute_indicators(
@@ -64,29 +277,125 @@ def compute_indicators(
     ema_fast: int = 9,
     ema_slow: int = 21,
     rsi_period: int = 14,
+    dtype=np.float64,
 ) -> pd.DataFrame:
     """
-    Compute indicators on dataframe clone and return it.
+    Compute indicators and return a new frame (input columns + indicators).
     Adds columns:
       - ema_fast
       - ema_slow
       - rsi
-    The function will not modify the input df in-place.
+    The function will not modify the input df in-place. Kolom OHLCV tidak
+    di-copy: hasil adalah shallow copy (blok data dipakai bersama dengan df).
+
+    dtype=np.float32: close dibaca & indikator disimpan sebagai float32 (setengah
+    byte memori/bandwidth untuk history panjang). Akumulator EWM di kernel tetap
+    float64, jadi error hanya dari pembulatan input/output (~7 digit signifikan).
+    Selisih close antar bar kehilangan presisi paling banyak (BTCUSDT 15m: EMA
+    rel. ~1e-7, RSI sampai ~1e-3), jadi bar dengan RSI tepat di sekitar ambang
+    RSI_LOW/RSI_HIGH bisa berbeda sinyal. Default float64 = hasil identik dengan pandas.
     """
     if close_col not in df.columns:
         raise ValueError(f"Close column '{close_col}' not found in DataFrame")
+    _require_ge1("ema_fast", ema_fast)
+    _require_ge1("ema_slow", ema_slow)
+    _require_ge1("rsi_period", rsi_period)
 
-    out = df.copy()
-    close = out[close_col].astype(float)
+    # kolom dengan dtype sama -> view tanpa copy; lainnya dikonversi sekali
+    close = df[close_col].to_numpy(dtype=dtype)
 
-    out["ema_fast"] = ema(close, span=ema_fast)
-    out["ema_slow"] = ema(close, span=ema_slow)
-    out["rsi"] = rsi(close, period=rsi_period)
+    # satu pass numba untuk ketiga indikator
+    n = len(close)
+    ef, es, rsi_arr = np.empty(n, dtype=dtype), np.empty(n, dtype=dtype), np.empty(n, dtype=dtype)
+    kernel = _compute_all_f8 if close.dtype == np.float64 else _compute_all
+    kernel(close, 2.0 / (ema_fast + 1.0), 2.0 / (ema_slow + 1.0), rsi_period, ef, es, rsi_arr, _new_state())
 
+    # shallow copy + set kolom baru: df asli tidak berubah, blok OHLCV tidak diduplikasi
+    # (df.assign() pada pandas 2.x tanpa copy-on-write tetap melakukan deep copy)
+    out = df.copy(deep=False)
+    out["ema_fast"] = ef
+    out["ema_slow"] = es
+    out["rsi"] = rsi_arr
     return out
 
 
-# Quick smoke test when module run directly
+# state incremental per symbol untuk update_indicators (proses live / polling)
+_STATE: dict[str, dict] = {}
+
+
+def update_indicators(
+    df_new_bars: pd.DataFrame,
+    symbol: str,
+    close_col: str = "close",
+    ema_fast: int = 9,
+    ema_slow: int = 21,
+    rsi_period: int = 14,
+) -> pd.DataFrame:
+    """
+    Update indikator incremental: hanya bar baru yang diproses, melanjutkan state
+    EWM/RSI terakhir symbol -> biaya per tick O(bar baru), bukan O(seluruh history).
+
+    - Panggilan pertama (atau setelah reset / parameter berubah): df_new_bars dianggap
+      history lengkap; hasil sama dengan compute_indicators(df_new_bars).
+    - Jika ada kolom 'timestamp', bar dengan timestamp <= bar terakhir yang sudah
+      diproses dilewati, jadi frame polling (mis. 200 bar terakhir) bisa langsung dikirim.
+      Kirim hanya bar yang sudah close (candle berjalan akan ikut masuk state).
+
+    Return: DataFrame kolom ema_fast, ema_slow, rsi untuk bar yang baru diproses
+    (index sama dengan df_new_bars); caller yang menggabungkan ke history.
+    """
+    if close_col not in df_new_bars.columns:
+        raise ValueError(f"Close column '{close_col}' not found in DataFrame")
+    _require_ge1("ema_fast", ema_fast)
+    _require_ge1("ema_slow", ema_slow)
+    _require_ge1("rsi_period", rsi_period)
+
+    params = (ema_fast, ema_slow, rsi_period)
+    st = _STATE.get(symbol)
+    if st is None or st["params"] != params:
+        st = {"params": params, "kernel": _new_state(), "last_ts": None}
+
+    df = df_new_bars
+    has_ts = "timestamp" in df.columns
+    if has_ts and st["last_ts"] is not None:
+        df = df[df["timestamp"] > st["last_ts"]]
+
+    close = df[close_col].to_numpy(dtype=np.float64)
+    n = len(close)
+    ef, es, rsi_arr = np.empty(n), np.empty(n), np.empty(n)
+    _compute_all_f8(close, 2.0 / (ema_fast + 1.0), 2.0 / (ema_slow + 1.0), rsi_period, ef, es, rsi_arr, st["kernel"])
+
+    if has_ts and n > 0:
+        st["last_ts"] = df["timestamp"].array[-1]
+    _STATE[symbol] = st
+    return pd.DataFrame({"ema_fast": ef, "ema_slow": es, "rsi": rsi_arr}, index=df.index)
+
+
+def reset_indicator_state(symbol: str | None = None) -> None:
+    """Hapus state update_indicators untuk satu symbol (atau semua jika None)."""
+    if symbol is None:
+        _STATE.clear()
+    else:
+        _STATE.pop(symbol, None)
+
+
+# warm-up JIT saat import (dari cache numba bila ada) agar request pertama tidak kena latensi compile.
+# Dengan ta_kernels tidak ada compile sama sekali saat import: jalur float32 (jarang dipakai)
+# di-compile lazily saat panggilan pertama.
+if _aot is None:
+    _warm = np.array([1.0, 2.0])
+    ema_nb(_warm, 2)
+    rsi_nb(_warm, 2)
+    _compute_all(_warm, 0.5, 0.5, 2, np.empty(2), np.empty(2), np.empty(2), _new_state())
+    _rolling_mean(_warm, 2, np.empty(2))
+    _warm32 = _warm.astype(np.float32)
+    _compute_all(_warm32, 0.5, 0.5, 2, np.empty_like(_warm32), np.empty_like(_warm32), np.empty_like(_warm32), _new_state())
+    del _warm32
+    del _warm
+
+
+# Quick smoke test when module run directly: python -m src.utils.indicators (dari root repo,
+# cache numba menyimpan kernel atas nama modul src.utils.indicators)
 if __name__ == "__main__":
     import pandas as pd
     # small synthetic example
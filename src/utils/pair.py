@@ -5,6 +5,33 @@ COMMON_QUOTES = [
     "USDT", "USDC", "BUSD", "USD", "BTC", "ETH", "BNB", "SOL", "ADA", "DOT", "XRP"
 ]
 
+# dihitung sekali saat import
+_SEP_RE = re.compile(r"[\s\-_:]+")
+
+# trie dari quote yang dibalik (USDT -> T,D,S,U); node yang berisi _END menandai quote lengkap.
+# Jalan sekali dari belakang string -> semua quote yang cocok sebagai suffix, tanpa endswith per quote.
+_END = ""
+_QTRIE: dict = {}
+for _q in COMMON_QUOTES:
+    _node = _QTRIE
+    for _ch in reversed(_q):
+        _node = _node.setdefault(_ch, {})
+    _node[_END] = _q
+del _q, _node, _ch
+
+
+def _match_quote(s: str) -> str | None:
+    """Quote terpanjang yang jadi suffix s dan masih menyisakan base (mis. BUSD -> USD)."""
+    node = _QTRIE
+    best = None
+    for i, ch in enumerate(reversed(s), 1):
+        node = node.get(ch)
+        if node is None:
+            break
+        if _END in node and i < len(s):
+            best = node[_END]
+    return best
+
 def normalize_pair(raw: str) -> str | None:
     """
     Normalize user-provided pair strings into FORM: BASE/QUOTE, e.g. BTC/USDT.
@@ -15,12 +42,11 @@ def normalize_pair(raw: str) -> str | None:
       'eth/usd' -> 'ETH/USD'
       'BTC/USDC' -> 'BTC/USDC'
     """
-    if not raw or not isinstance(raw, str):
+    if not isinstance(raw, str) or not raw:
         return None
 
-    s = raw.strip().upper()
     # replace separators with '/'
-    s = re.sub(r"[\s\-_:]+", "/", s)
+    s = _SEP_RE.sub("/", raw.strip().upper())
 
     # if already contains '/', validate and return
     if "/" in s:
@@ -33,19 +59,12 @@ def normalize_pair(raw: str) -> str | None:
         return f"{base}/{quote}"
 
     # try match known quote suffixes (USDT, USDC, BTC, etc.)
-    for q in COMMON_QUOTES:
-        if s.endswith(q):
-            base = s[:-len(q)]
-            if base:
-                return f"{base}/{q}"
+    q = _match_quote(s)
+    if q is not None:
+        return f"{s[:-len(q)]}/{q}"
 
     # fallback: try split in middle if length even-ish (best-effort)
     if len(s) >= 6:
-        # try to find a split point where right part is one of common quotes
-        for q in COMMON_QUOTES:
-            if s.endswith(q):
-                base = s[: -len(q)]
-                return f"{base}/{q}"
         # naive split: half-half
         mid = len(s) // 2
         base, quote = s[:mid], s[mid:]
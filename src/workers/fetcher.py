@@ -1,18 +1,21 @@
 # src/workers/fetcher.py
+import time
 import ccxt
+import ccxt.async_support as ccxt_async
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from src.config import BYBIT_API_KEY, BYBIT_API_SECRET, TIMEFRAME
 
+# umur cache markets (detik) sebelum load_markets di-reload dari API
+MARKETS_TTL_SECONDS = 300
+
 
 # =========================================================
 # CREATE EXCHANGE
 # =========================================================
-def create_exchange(default_type: str = "spot"):
-    """
-    Membuat instance ccxt.bybit dengan API key dari .env
-    """
-    opts = {
+def _exchange_opts(default_type: str) -> dict:
+    return {
         "apiKey": BYBIT_API_KEY or None,
         "secret": BYBIT_API_SECRET or None,
         "enableRateLimit": True,
@@ -22,31 +25,51 @@ def create_exchange(default_type: str = "spot"):
         }
     }
 
-    ex = ccxt.bybit(opts)
+
+def create_exchange(default_type: str = "spot"):
+    """
+    Membuat instance ccxt.bybit dengan API key dari .env
+    """
+    ex = ccxt.bybit(_exchange_opts(default_type))
+    ex._markets_cache = (0.0, None)  # (time.monotonic() saat load, markets dict)
     return ex
 
 
+def create_async_exchange(default_type: str = "spot"):
+    """
+    Sama dengan create_exchange, tapi ccxt.async_support.bybit (method di-await).
+    Wajib ditutup dengan `await ex.close()` setelah selesai.
+    """
+    return ccxt_async.bybit(_exchange_opts(default_type))
+
+
 # =========================================================
 # LIST USDT PAIRS
 # =========================================================
 def list_usdt_pairs(ex):
     """
-    Ambil semua pasangan USDT dari Bybit.
+    Ambil semua pasangan USDT (yang aktif) dari Bybit.
     Mengambil dari market spot (defaultType=spot).
+    Markets di-cache di exchange selama MARKETS_TTL_SECONDS; setelah itu di-reload dari API.
     """
-    try:
-        markets = ex.load_markets()
-    except Exception as e:
-        print("Failed to load markets:", e)
-        return []
+    loaded_at, markets = getattr(ex, "_markets_cache", (0.0, None))
+    if markets is None or time.monotonic() - loaded_at >= MARKETS_TTL_SECONDS:
+        try:
+            # ccxt sendiri menyimpan markets di instance -> reload=True agar benar-benar refresh
+            markets = ex.load_markets(reload=markets is not None)
+        except Exception as e:
+            print("Failed to load markets:", e)
+            if markets is None:
+                return []
+        else:
+            ex._markets_cache = (time.monotonic(), markets)
 
-    usdt_pairs = [
-        m for m in markets.keys()
-        if m.endswith("/USDT")
+    # active bisa None (tidak diketahui) -> tetap diikutkan, hanya buang yang jelas nonaktif
+    return [
+        sym for sym, m in markets.items()
+        if sym.endswith("/USDT") and m.get("active") is not False
     ]
 
-    return usdt_pairs
-
 
 # =========================================================
 # FETCH OHLCV
@@ -61,10 +84,16 @@ def fetch_ohlcv_df(ex, symbol: str, timeframe: str = TIMEFRAME, limit: int = 200
         print(f"Failed to fetch OHLCV {symbol}:", e)
         return None
 
-    df = pd.DataFrame(
-        ohlcv,
-        columns=["timestamp", "open", "high", "low", "close", "volume"]
-    )
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    # langsung dari array float64 per kolom: tanpa konversi list-of-lists per sel
+    # dan tanpa replace kolom timestamp setelahnya (timestamp UTC, sama dgn fetch_full_ohlcv)
+    arr = np.asarray(ohlcv or [], dtype=np.float64).reshape(-1, 6)
+    df = pd.DataFrame({
+        "timestamp": pd.to_datetime(arr[:, 0].astype(np.int64), unit="ms", utc=True),
+        "open": arr[:, 1],
+        "high": arr[:, 2],
+        "low": arr[:, 3],
+        "close": arr[:, 4],
+        "volume": arr[:, 5],
+    }, copy=False)
 
     return df
@@ -7,24 +7,85 @@ Logika:
 - Jika RSI > RSI_HIGH -> SELL
 
 Fitur:
-- return dict sinyal (symbol, side, entry_price, stop_price, take_price, sl_pct, rr)
+- return Signal (symbol, side, entry_price, stop_price, take_price, sl_pct, rr, rsi);
+  bisa dibaca seperti dict (sig["side"], sig.get(...)), to_dict() untuk output/tampilan
 - menerima fixed_rr atau sl_pct
 - tidak otomatis menulis ke storage / telegram (tetap murni deteksi)
 """
 from __future__ import annotations
+from dataclasses import dataclass, fields
 from typing import Optional, Dict, Any
+import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime, timezone
 
 from src import config
 from src.storage import Storage
+from src.utils.indicators import compute_indicators
 
 # RSI thresholds default
 RSI_LOW = 21.0
 RSI_HIGH = 79.0
 
 
+@dataclass(slots=True, frozen=True)
+class Signal:
+    """
+    Hasil deteksi sinyal (nilai mentah, tanpa pembulatan).
+    Kompatibel dengan akses dict lama (hanya nama field): sig["side"], sig.get("stop_price"),
+    "side" in sig, iterasi/keys() atas nama field, dict(sig).
+    Pembulatan (harga 8 desimal, rsi 3 desimal) dilakukan saat output via to_dict().
+    """
+    symbol: str
+    side: str
+    entry_price: float
+    entry_ts: Any
+    stop_price: Optional[float]
+    take_price: Optional[float]
+    sl_pct: Optional[float]
+    rr: Optional[float]
+    rsi: float
+
+    def __getitem__(self, key: str):
+        if key not in _SIGNAL_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key) -> bool:
+        return key in _SIGNAL_FIELDS
+
+    def __iter__(self):
+        return iter(_SIGNAL_FIELDS)
+
+    def __len__(self) -> int:
+        return len(_SIGNAL_FIELDS)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in _SIGNAL_FIELDS else default
+
+    def keys(self):
+        return list(_SIGNAL_FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """dict siap tampil/simpan (format dict sinyal lama, dengan pembulatan)."""
+        return {
+            "symbol": self.symbol,
+            "side": self.side,
+            "entry_price": round(self.entry_price, 8) if self.entry_price is not None else None,
+            "entry_ts": self.entry_ts,
+            "stop_price": round(self.stop_price, 8) if self.stop_price is not None else None,
+            "take_price": round(self.take_price, 8) if self.take_price is not None else None,
+            "sl_pct": self.sl_pct,
+            "rr": self.rr,
+            "rsi": round(self.rsi, 3),
+        }
+
+
+# nama field Signal: satu-satunya key untuk akses gaya dict (bukan method/atribut lain)
+_SIGNAL_FIELDS = tuple(f.name for f in fields(Signal))
+
+
 def _safe_last(df: pd.DataFrame, col: str):
     """Ambil nilai terakhir kolom, fallback None jika tidak ada."""
     if col in df.columns and len(df) > 0:
@@ -42,7 +103,7 @@ def detect_signal(df: pd.DataFrame,
                   fixed_rr: Optional[float] = None,
                   sl_pct: Optional[float] = None,
                   rsi_low: float = RSI_LOW,
-                  rsi_high: float = RSI_HIGH) -> Optional[Dict[str, Any]]:
+                  rsi_high: float = RSI_HIGH) -> Optional[Signal]:
     """
     Deteksi sinyal berbasis RSI.
 
@@ -56,7 +117,7 @@ def detect_signal(df: pd.DataFrame,
 
     Return:
       None jika tidak ada sinyal.
-      dict jika ada sinyal:
+      Signal jika ada sinyal (field di bawah; akses juga bisa sig['side'] / sig.get(...)):
         {
           'symbol': ...,
           'side': 'BUY'|'SELL',
@@ -73,20 +134,39 @@ def detect_signal(df: pd.DataFrame,
         return None
 
     # pastikan kolom rsi dan close ada
-    if "rsi" not in df.columns or ("close" not in df.columns and "price" not in df.columns):
+    cols = df.columns
+    if "rsi" not in cols or ("close" not in cols and "price" not in cols):
         return None
 
-    # ambil nilai terakhir rsi & price & timestamp
-    last_rsi = df["rsi"].iloc[-1]
-    entry_price = None
-    if "close" in df.columns:
-        entry_price = float(df["close"].iloc[-1])
-    elif "price" in df.columns:
-        entry_price = float(df["price"].iloc[-1])
+    # ambil nilai terakhir rsi & price & timestamp langsung dari array kolom
+    # (lebih murah dari .iloc[-1] per kolom maupun df.iloc[-1] yang mem-box semua kolom)
+    price_col = "close" if "close" in cols else "price"
+    last = {
+        "rsi": df["rsi"].array[-1],
+        price_col: df[price_col].array[-1],
+        "timestamp": df["timestamp"].array[-1] if "timestamp" in cols else None,
+    }
+    return detect_signal_from_row(last, symbol, fixed_rr=fixed_rr, sl_pct=sl_pct,
+                                  rsi_low=rsi_low, rsi_high=rsi_high)
+
 
-    entry_ts = None
-    if "timestamp" in df.columns:
-        entry_ts = df["timestamp"].iloc[-1]
+def detect_signal_from_row(last: Dict[str, Any],
+                           symbol: str,
+                           fixed_rr: Optional[float] = None,
+                           sl_pct: Optional[float] = None,
+                           rsi_low: float = RSI_LOW,
+                           rsi_high: float = RSI_HIGH) -> Optional[Signal]:
+    """
+    Sama dengan detect_signal, tapi menerima bar terakhir yang sudah berupa dict
+    (mis. df.iloc[-1].to_dict()) dengan key 'rsi', 'close' (atau 'price'), 'timestamp' (opsional).
+    Murni Python, tanpa overhead pandas per panggilan.
+    """
+    if "rsi" not in last or ("close" not in last and "price" not in last):
+        return None
+
+    last_rsi = last["rsi"]
+    entry_price = float(last["close"]) if "close" in last else float(last["price"])
+    entry_ts = last.get("timestamp")
 
     # jika rsi bukan number -> abort
     try:
@@ -103,6 +183,18 @@ def detect_signal(df: pd.DataFrame,
         # tidak melewati threshold -> tidak ada sinyal
         return None
 
+    return _build_signal(symbol, side, entry_price, entry_ts, last_rsi_val,
+                         fixed_rr=fixed_rr, sl_pct=sl_pct)
+
+
+def _build_signal(symbol: str,
+                  side: str,
+                  entry_price: float,
+                  entry_ts,
+                  last_rsi_val: float,
+                  fixed_rr: Optional[float] = None,
+                  sl_pct: Optional[float] = None) -> Signal:
+    """Hitung stop/take dari entry & side, lalu bentuk Signal."""
     # default sl_pct jika user memberikan fixed_rr saja
     if sl_pct is None and fixed_rr is not None:
         sl_pct = 0.01  # default 1% jika user memakai fixed_rr tanpa sl_pct
@@ -137,16 +229,76 @@ def detect_signal(df: pd.DataFrame,
         stop_price = None
         take_price = None
 
-    result = {
-        "symbol": symbol,
-        "side": side,
-        "entry_price": round(entry_price, 8) if entry_price is not None else None,
-        "entry_ts": entry_ts if entry_ts is not None else None,
-        "stop_price": round(stop_price, 8) if stop_price is not None else None,
-        "take_price": round(take_price, 8) if take_price is not None else None,
-        "sl_pct": sl_pct_out,
-        "rr": rr_out,
-        "rsi": round(last_rsi_val, 3),
-    }
+    return Signal(symbol, side, entry_price, entry_ts, stop_price, take_price,
+                  sl_pct_out, rr_out, last_rsi_val)
+
+
+def vectorized_signals(df: pd.DataFrame,
+                       ema_fast: int = config.EMA_FAST,
+                       ema_slow: int = config.EMA_SLOW,
+                       rsi_period: int = config.RSI_PERIOD,
+                       rsi_low: float = RSI_LOW,
+                       rsi_high: float = RSI_HIGH) -> np.ndarray:
+    """
+    Versi vectorized dari aturan detect_signal untuk seluruh bar sekaligus.
+
+    Memakai kolom 'rsi' jika sudah ada; jika belum, indikator dihitung sekali
+    dari 'close' (ema_fast/ema_slow/rsi_period diteruskan ke compute_indicators).
+
+    Return:
+      np.ndarray int8 sepanjang df: 1 = BUY, -1 = SELL, 0 = tidak ada sinyal.
+      Nilai di index i sama dengan hasil detect_signal(df.iloc[:i+1]).
+    """
+    if df is None or len(df) == 0:
+        return np.zeros(0, dtype=np.int8)
+
+    if "rsi" not in df.columns:
+        df = compute_indicators(df, ema_fast=ema_fast, ema_slow=ema_slow, rsi_period=rsi_period)
+
+    rsi_arr = pd.to_numeric(df["rsi"], errors="coerce").to_numpy(dtype=np.float64)
+    # NaN tidak lolos kedua perbandingan -> 0 (sama seperti detect_signal)
+    return np.where(rsi_arr <= float(rsi_low), 1,
+                    np.where(rsi_arr >= float(rsi_high), -1, 0)).astype(np.int8)
+
+
+def batch_detect_signal(df: pd.DataFrame,
+                        symbol: str,
+                        fixed_rr: Optional[float] = None,
+                        sl_pct: Optional[float] = None,
+                        rsi_low: float = RSI_LOW,
+                        rsi_high: float = RSI_HIGH,
+                        ema_fast: int = config.EMA_FAST,
+                        ema_slow: int = config.EMA_SLOW,
+                        rsi_period: int = config.RSI_PERIOD) -> Dict[int, Signal]:
+    """
+    Padanan detect_signal untuk backtester: deteksi sinyal di semua bar dalam satu pass.
+
+    Return:
+      dict {bar_index: sinyal} hanya untuk bar yang punya sinyal; isi sinyal sama
+      dengan detect_signal(df.iloc[:bar_index+1], symbol, ...).
+    """
+    if df is None or len(df) == 0:
+        return {}
+
+    if "rsi" not in df.columns:
+        df = compute_indicators(df, ema_fast=ema_fast, ema_slow=ema_slow, rsi_period=rsi_period)
+    if "close" not in df.columns and "price" not in df.columns:
+        return {}
+
+    sides = vectorized_signals(df, rsi_low=rsi_low, rsi_high=rsi_high)
+    prices = df["close" if "close" in df.columns else "price"].to_numpy(dtype=np.float64)
+    rsi_arr = pd.to_numeric(df["rsi"], errors="coerce").to_numpy(dtype=np.float64)
+    timestamps = df["timestamp"].array if "timestamp" in df.columns else None
 
-    return result
+    out = {}
+    for i in np.flatnonzero(sides):
+        out[int(i)] = _build_signal(
+            symbol,
+            "BUY" if sides[i] == 1 else "SELL",
+            float(prices[i]),
+            timestamps[i] if timestamps is not None else None,
+            float(rsi_arr[i]),
+            fixed_rr=fixed_rr,
+            sl_pct=sl_pct,
+        )
+    return out
@@ -0,0 +1,51 @@
+# src/workers/signal_engine_nb.py
+"""
+Signal Engine (Numba) — jalur cepat untuk backtest.
+
+Padanan compiled dari compute_indicators + detect_signal untuk seluruh seri
+sekaligus, bekerja langsung pada array NumPy (tanpa pandas per bar).
+
+Fungsi:
+ - ema_nb(close, period)   -> EMA (kernel dari src.utils.indicators)
+ - rsi_nb(close, period)   -> RSI Wilder (kernel dari src.utils.indicators)
+ - signals_nb(close, rsi_period, sl_pct, rr, rsi_low, rsi_high)
+     -> (side_i8, entry, stop, take, rsi) per bar; side 1=BUY, -1=SELL, 0=none
+
+Catatan:
+ - Update EWM mengikuti rumus pandas (dibagi total bobot), jadi hasilnya
+   identik dengan versi pandas, termasuk ambang RSI_LOW/RSI_HIGH.
+ - stop/take belum dibulatkan; Signal.to_dict() membulatkan ke 8 desimal.
+"""
+from __future__ import annotations
+import numpy as np
+from numba import njit
+
+from src.utils.indicators import ema_nb, rsi_nb  # kernel dipakai bersama (diekspor ulang)
+from src.workers.signal_engine import RSI_LOW, RSI_HIGH
+
+
+@njit(cache=True)
+def signals_nb(close, rsi_period, sl_pct, rr, rsi_low=RSI_LOW, rsi_high=RSI_HIGH):
+    """
+    Aturan detect_signal untuk semua bar: BUY jika rsi <= rsi_low, SELL jika rsi >= rsi_high.
+    stop = entry -/+ sl_pct, take = entry +/- rr * risk. Bar tanpa sinyal -> NaN.
+    """
+    n = len(close)
+    rsi = rsi_nb(close, rsi_period)
+    side = np.zeros(n, dtype=np.int8)
+    entry = np.full(n, np.nan, dtype=np.float64)
+    stop = np.full(n, np.nan, dtype=np.float64)
+    take = np.full(n, np.nan, dtype=np.float64)
+    for i in range(n):
+        e = close[i]
+        if rsi[i] <= rsi_low:
+            side[i] = 1
+            entry[i] = e
+            stop[i] = e * (1.0 - sl_pct)
+            take[i] = e + rr * (e - stop[i])
+        elif rsi[i] >= rsi_high:
+            side[i] = -1
+            entry[i] = e
+            stop[i] = e * (1.0 + sl_pct)
+            take[i] = e - rr * (stop[i] - e)
+    return side, entry, stop, take, rsi